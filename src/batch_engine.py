@@ -0,0 +1,532 @@
+# batch_engine.py
+"""
+批量锁步模拟引擎：用 NumPy 的结构数组表示整个机器状态，
+第0维为配置（batch），在同一条指令序列上同时推进成千上万个 CPU 配置。
+
+每个周期按与 CPU.run_simulation 相同的顺序执行：发射 -> Load Buffer -> Add -> Mult -> ROB
+-> 寄存器 -> 总线，并逐一复现对象模型中的细节（例如总线写冲突时 Load 结果丢失、
+寄存器在写结果后一个周期被无条件清除等），因此结果可以与 main.CPU 逐周期对拍。
+引擎只模拟时序与标签，不计算数据值。
+"""
+import argparse
+import contextlib
+import itertools
+import os
+
+import numpy as np
+
+from main import CPU, ADD_EXECUTION_CYCLES, MULT_EXECUTION_CYCLES, DEFAULT_CONFIG, load_instructions
+
+# 操作码编号
+OP_LD, OP_SD, OP_ADDD, OP_SUBD, OP_MULTD, OP_DIVD = range(6)
+OPCODES = {"LD": OP_LD, "SD": OP_SD, "ADDD": OP_ADDD, "SUBD": OP_SUBD, "MULTD": OP_MULTD, "DIVD": OP_DIVD}
+
+# ROB条目状态编号
+EMPTY, ISSUE, EXEC, WRITE, COMMIT = range(5)
+
+# 寄存器名编码：F寄存器与R寄存器分属不同命名空间，但共用同一个寄存器数组下标
+R_NAMESPACE = 1 << 16
+
+
+def encode_register(res, num_registers):
+    """
+    将寄存器标识符编码为 (名称编码, 下标, 是否F寄存器)。
+
+    Input:
+    - res (str): 寄存器标识符，如 F2、R3
+    - num_registers (int): 寄存器数量
+
+    Output:
+    - tuple: (名称编码, 下标, 是否F寄存器)
+    """
+    if res[0] in {'F', 'R'} and res[1:].isdigit():
+        index = int(res[1:])
+        if res[0] == 'F':
+            if index >= num_registers:
+                raise ValueError(f"Register {res} out of range.")
+            return index, index, True
+        return R_NAMESPACE + index, index, False
+    raise ValueError("Invalid format. The input should be in the format 'F OR R+数字'")
+
+
+class EncodedTrace:
+    def __init__(self, instructions, num_registers):
+        """
+        将指令序列编码为按字段拆分的数组，供批量引擎按程序计数器收集。
+
+        Args:
+        - instructions (list): 指令对象列表
+        - num_registers (int): 寄存器数量
+        """
+        length = len(instructions)
+        self.length = length
+        self.op = np.zeros(length, dtype=np.int8)
+        self.latency = np.ones(length, dtype=np.int32)
+        # 目的寄存器、源操作数1、源操作数2 的编码
+        self.name = np.zeros((3, length), dtype=np.int32)
+        self.index = np.zeros((3, length), dtype=np.int32)
+        self.is_f = np.zeros((3, length), dtype=bool)
+        for i, ins in enumerate(instructions):
+            if ins.opcode not in OPCODES:
+                raise ValueError(f"Error Instruction!")
+            op = OPCODES[ins.opcode]
+            self.op[i] = op
+            self.latency[i] = {**ADD_EXECUTION_CYCLES, **MULT_EXECUTION_CYCLES}.get(ins.opcode, 1)
+            operands = [ins.destination]
+            if op in {OP_ADDD, OP_SUBD, OP_MULTD, OP_DIVD}:
+                operands += [ins.src1, ins.src2]
+            elif op == OP_LD:
+                operands += [ins.src2, ins.src2]
+            for k, res in enumerate(operands):
+                self.name[k, i], self.index[k, i], self.is_f[k, i] = encode_register(res, num_registers)
+            if op != OP_SD and self.index[0, i] >= num_registers:
+                raise ValueError(f"Register {ins.destination} out of range.")
+
+
+class StationArrays:
+    def __init__(self, batch, counts):
+        """
+        一类保留站的结构数组，形状为 (配置数, 最大保留站数)。
+
+        Args:
+        - batch (int): 配置数量
+        - counts (ndarray): 每个配置的保留站数量
+        """
+        size = max(int(counts.max()), 1)
+        self.size = size
+        self.exists = np.arange(size)[None, :] < counts[:, None]
+        self.busy = np.zeros((batch, size), dtype=bool)
+        self.qj = np.zeros((batch, size), dtype=np.int64)
+        self.qk = np.zeros((batch, size), dtype=np.int64)
+        self.vj_ok = np.zeros((batch, size), dtype=bool)  # 仅Load Buffer使用：基址是否可用
+        self.remain_time = np.full((batch, size), -1, dtype=np.int32)
+        self.rob = np.zeros((batch, size), dtype=np.int64)
+        self.issue_this_cycle = np.zeros((batch, size), dtype=bool)
+
+    def first_free(self, rows):
+        """
+        返回给定配置中第一个空闲保留站的下标及是否存在空闲保留站。
+
+        Args:
+        - rows (ndarray): 配置下标
+
+        Returns:
+        - tuple: (保留站下标, 是否存在)
+        """
+        free = ~self.busy[rows] & self.exists[rows]
+        return free.argmax(axis=1), free.any(axis=1)
+
+
+class BatchCPU:
+    def __init__(self, configs, instruction_queue, num_registers=11, record_cycles=False):
+        """
+        批量CPU：所有配置共享同一条指令序列，按周期锁步推进。
+
+        Args:
+        - configs (list): 配置字典列表，键见 DEFAULT_CONFIG
+        - instruction_queue (list): 指令对象列表
+        - num_registers (int): 寄存器数量
+        - record_cycles (bool): 是否记录每条指令四个阶段的周期，占用 配置数*指令数*4 的内存
+        """
+        configs = [{**DEFAULT_CONFIG, **config} for config in configs]
+        self.configs = configs
+        self.trace = EncodedTrace(instruction_queue, num_registers)
+        batch = len(configs)
+        self.batch = batch
+        self.rows = np.arange(batch)
+
+        self.rob_entries = np.array([c["num_rob_entries"] for c in configs], dtype=np.int64)
+        self.load = StationArrays(batch, np.array([c["num_load_buffers"] for c in configs]))
+        self.add = StationArrays(batch, np.array([c["num_add_stations"] for c in configs]))
+        self.mult = StationArrays(batch, np.array([c["num_mult_stations"] for c in configs]))
+
+        # ROB：指令的ROB序号即其在序列中的位置，因此以 序号 % ring 定位槽位
+        ring = int(self.rob_entries.max())
+        self.ring = ring
+        self.rob_state = np.zeros((batch, ring), dtype=np.int8)
+        self.rob_seq = np.full((batch, ring), -1, dtype=np.int64)
+        self.rob_issue_this_cycle = np.zeros((batch, ring), dtype=bool)
+        self.rob_exec = np.zeros((batch, ring), dtype=bool)  # 对应 Bus.exec
+        self.sd_vj_ok = np.zeros((batch, ring), dtype=bool)
+        self.sd_qj = np.zeros((batch, ring), dtype=np.int64)
+        self.head = np.zeros(batch, dtype=np.int64)  # 最老的未提交指令
+        self.pc = np.zeros(batch, dtype=np.int64)  # 下一条待发射指令
+
+        # 寄存器标签
+        self.reg_busy = np.zeros((batch, num_registers), dtype=bool)
+        self.reg_label = np.zeros((batch, num_registers), dtype=np.int64)
+
+        # 公共数据总线与ROB写寄存器的总线，0/-1 表示空
+        self.bus_label = np.zeros(batch, dtype=np.int64)
+        self.bus_new_label = np.zeros(batch, dtype=np.int64)
+        self.rob_bus_name = np.full(batch, -1, dtype=np.int64)
+        self.rob_bus_index = np.zeros(batch, dtype=np.int64)
+        self.rob_bus_value = np.zeros(batch, dtype=np.int64)
+        self.rob_bus_new_name = np.full(batch, -1, dtype=np.int64)
+        self.rob_bus_new_index = np.zeros(batch, dtype=np.int64)
+        self.rob_bus_new_value = np.zeros(batch, dtype=np.int64)
+
+        self.clock_cycles = 0
+        self.active = np.ones(batch, dtype=bool)
+        self.cycles = np.full(batch, -1, dtype=np.int64)  # 每个配置结束时的周期数
+        self.state_cycle = np.full((batch, self.trace.length, 4), -1, dtype=np.int32) if record_cycles else None
+
+    def read_register(self, rows, slot, seq):
+        """
+        批量读取寄存器，对应 RegisterGroup.read。
+
+        Args:
+        - rows (ndarray): 配置下标
+        - slot (int): 操作数位置，0 为目的寄存器，1、2 为源操作数
+        - seq (ndarray): 各配置当前指令的序号
+
+        Returns:
+        - tuple: (vj 是否为真值, qj 标签，0 表示无)
+        """
+        name = self.trace.name[slot, seq]
+        index = self.trace.index[slot, seq]
+        is_f = self.trace.is_f[slot, seq]
+        hit = self.rob_bus_name[rows] == name
+        gather = np.minimum(index, self.reg_busy.shape[1] - 1)
+        busy = is_f & ~hit & self.reg_busy[rows, gather]
+        qj = np.where(busy, self.reg_label[rows, gather], 0)
+        # 寄存器就绪时 vj 为寄存器下标，下标为0时在对象模型中被视为假值
+        vj_ok = hit | (~busy & (index != 0))
+        return vj_ok, qj
+
+    def issue_instructions(self):
+        """
+        每个配置至多发射一条指令，对应 CPU.issue_instructions。
+
+        Returns:
+        - None
+        """
+        rows = self.rows[self.active & (self.pc < self.trace.length)]
+        if not rows.size:
+            return
+        seq = self.pc[rows]
+        op = self.trace.op[seq]
+        sd_vj_ok, sd_qj = self.read_register(rows, 0, seq)
+        ok = (seq - self.head[rows]) < self.rob_entries[rows]  # ROB未满
+
+        is_sd = op == OP_SD
+        success = ok & is_sd
+        for unit, ops in ((self.add, (OP_ADDD, OP_SUBD)), (self.mult, (OP_MULTD, OP_DIVD)), (self.load, (OP_LD,))):
+            want = ok & np.isin(op, ops)
+            if not want.any():
+                continue
+            r = rows[want]
+            s = seq[want]
+            station, has_free = unit.first_free(r)
+            r, s, station = r[has_free], s[has_free], station[has_free]
+            vj_ok, qj = self.read_register(r, 1, s)
+            unit.busy[r, station] = True
+            unit.qj[r, station] = qj
+            unit.vj_ok[r, station] = vj_ok
+            if unit is self.load:
+                unit.qk[r, station] = 0
+                unit.remain_time[r, station] = 2
+            else:
+                unit.qk[r, station] = self.read_register(r, 2, s)[1]
+                unit.remain_time[r, station] = self.trace.latency[s]
+            unit.rob[r, station] = s + 1
+            unit.issue_this_cycle[r, station] = True
+            success[np.flatnonzero(want)[has_free]] = True
+
+        rows, seq, is_sd = rows[success], seq[success], is_sd[success]
+        sd_vj_ok, sd_qj = sd_vj_ok[success], sd_qj[success]
+        # 非SD指令写入寄存器标签
+        w = ~is_sd
+        dest = self.trace.index[0, seq[w]]
+        self.reg_busy[rows[w], dest] = True
+        self.reg_label[rows[w], dest] = seq[w] + 1
+        # 写入ROB条目
+        slot = seq % self.ring
+        self.rob_state[rows, slot] = ISSUE
+        self.rob_seq[rows, slot] = seq
+        self.rob_issue_this_cycle[rows, slot] = True
+        self.sd_vj_ok[rows, slot] = sd_vj_ok
+        self.sd_qj[rows, slot] = np.where(is_sd, sd_qj, 0)
+        if self.state_cycle is not None:
+            self.state_cycle[rows, seq, 0] = self.clock_cycles
+        self.pc[rows] += 1
+
+    def mark_exec(self, mask, rob):
+        """
+        记录本周期正在执行的指令，对应 bus.exec.append。
+
+        Args:
+        - mask (ndarray): 各配置是否有指令在执行
+        - rob (ndarray): 各配置中执行指令的ROB序号
+
+        Returns:
+        - None
+        """
+        self.rob_exec[self.rows[mask], (rob[mask] - 1) % self.ring] = True
+
+    def update_load_buffers(self):
+        """
+        更新 Load Buffer，对应 Memory.update。
+
+        Returns:
+        - None
+        """
+        unit = self.load
+        label = self.bus_label
+        for s in range(unit.size):
+            busy = unit.busy[:, s] & self.active
+            skip = busy & unit.issue_this_cycle[:, s]
+            unit.issue_this_cycle[skip, s] = False
+            go = busy & ~skip
+            remain = unit.remain_time[:, s]
+            two = go & (remain == 2)
+            start = two & unit.vj_ok[:, s]
+            capture = two & ~unit.vj_ok[:, s] & (unit.qj[:, s] > 0) & (unit.qj[:, s] == label)
+            one = go & (remain == 1)
+            done = go & (remain != 2) & (remain != 1)
+            self.mark_exec(start, unit.rob[:, s])
+            unit.vj_ok[capture, s] = True
+            unit.qj[capture, s] = 0
+            # Load 写总线不检查是否成功，冲突时结果丢失
+            write = one & (self.bus_new_label == 0)
+            self.bus_new_label[write] = unit.rob[write, s]
+            unit.remain_time[start | one, s] -= 1
+            unit.busy[done, s] = False
+
+    def update_fp_unit(self, unit):
+        """
+        更新浮点数执行单元，对应 FPUnit.update。
+
+        Args:
+        - unit (StationArrays): Add 或 Mult 保留站
+
+        Returns:
+        - None
+        """
+        label = self.bus_label
+        has_data = label > 0
+        for s in range(unit.size):
+            busy = unit.busy[:, s] & self.active
+            qj, qk = unit.qj[:, s], unit.qk[:, s]
+            wait = busy & ((qj > 0) | (qk > 0))
+            cj = wait & has_data & (qj == label)
+            ck = wait & has_data & ~cj & (qk == label)
+            ready = busy & ~wait
+            run = ready & (unit.remain_time[:, s] > 0) & ~unit.issue_this_cycle[:, s]
+            free = ready & (unit.remain_time[:, s] <= 0)
+            unit.qj[cj, s] = 0
+            unit.qk[ck, s] = 0
+            self.mark_exec(run, unit.rob[:, s])
+            unit.remain_time[run, s] -= 1
+            finish = run & (unit.remain_time[:, s] == 0)
+            write = finish & (self.bus_new_label == 0)
+            self.bus_new_label[write] = unit.rob[write, s]
+            unit.remain_time[finish & ~write, s] += 1  # 总线被占用，下个周期重试
+            unit.busy[free, s] = False
+            unit.issue_this_cycle[busy, s] = False
+
+    def update_reorder_buffer(self):
+        """
+        更新ROB，对应 ReorderBuffer.update 与 update_sd。
+
+        Returns:
+        - None
+        """
+        clock = self.clock_cycles
+        seq = self.rob_seq
+        inflight = (seq >= self.head[:, None]) & (seq < self.pc[:, None]) & self.active[:, None]
+        is_head = seq == self.head[:, None]
+        is_sd = self.trace.op[np.maximum(seq, 0)] == OP_SD
+        label = self.bus_label[:, None]
+        state = self.rob_state
+
+        # SD条目
+        sd = inflight & is_sd
+        capture = sd & (self.sd_qj > 0) & (self.sd_qj == label)
+        self.sd_vj_ok |= capture
+        self.sd_qj[capture] = 0
+        sd_issue = sd & (state == ISSUE)
+        first = sd_issue & self.rob_issue_this_cycle
+        self.rob_issue_this_cycle[first] = False
+        to_exec = sd_issue & ~first
+        sd_commit = sd & ~sd_issue & is_head & (state == EXEC) & self.sd_vj_ok
+        state[to_exec] = EXEC
+
+        # 其他条目
+        other = inflight & ~is_sd
+        state[other & (state == ISSUE) & self.rob_exec] = EXEC
+        commit = other & is_head & (state == WRITE)
+        write = other & (label > 0) & (seq + 1 == label)
+        state[write] = WRITE
+        state[commit | sd_commit] = COMMIT
+
+        if self.state_cycle is not None:
+            r, c = np.nonzero(sd_commit)
+            self.state_cycle[r, seq[r, c], 1] = clock - 1
+            self.state_cycle[r, seq[r, c], 2] = clock
+            r, c = np.nonzero(commit)
+            self.state_cycle[r, seq[r, c], 3] = clock
+            r, c = np.nonzero(write)
+            self.state_cycle[r, seq[r, c], 1] = clock - 1
+            self.state_cycle[r, seq[r, c], 2] = clock
+
+        # 写结果的条目通过 rob_bus 通知寄存器组
+        r, c = np.nonzero(write)
+        s = seq[r, c]
+        self.rob_bus_new_name[r] = self.trace.name[0, s]
+        self.rob_bus_new_index[r] = self.trace.index[0, s]
+        self.rob_bus_new_value[r] = s + 1
+        self.head += (commit | sd_commit).any(axis=1)
+
+    def update_registers(self):
+        """
+        根据 rob_bus 清除寄存器标签，对应 RegisterGroup.update。
+
+        Returns:
+        - None
+        """
+        rows = self.rows[(self.rob_bus_value > 0) & self.active]
+        index = self.rob_bus_index[rows]
+        self.reg_busy[rows, index] = False
+        self.reg_label[rows, index] = 0
+
+    def update_buses(self):
+        """
+        周期末更新总线，对应 Bus.update。
+
+        Returns:
+        - None
+        """
+        self.bus_label = self.bus_new_label
+        self.bus_new_label = np.zeros(self.batch, dtype=np.int64)
+        self.rob_exec[:] = False
+        self.rob_bus_name = self.rob_bus_new_name
+        self.rob_bus_index = self.rob_bus_new_index
+        self.rob_bus_value = self.rob_bus_new_value
+        self.rob_bus_new_name = np.full(self.batch, -1, dtype=np.int64)
+        self.rob_bus_new_index = np.zeros(self.batch, dtype=np.int64)
+        self.rob_bus_new_value = np.zeros(self.batch, dtype=np.int64)
+
+    def step(self):
+        """
+        所有未结束的配置同时推进一个周期。
+
+        Returns:
+        - None
+        """
+        self.clock_cycles += 1
+        self.issue_instructions()
+        self.update_load_buffers()
+        self.update_fp_unit(self.add)
+        self.update_fp_unit(self.mult)
+        self.update_reorder_buffer()
+        self.update_registers()
+        self.update_buses()
+
+        idle = (self.head == self.pc) & (self.pc == self.trace.length)  # 指令已全部发射且已全部提交
+        for unit in (self.load, self.add, self.mult):
+            idle &= ~unit.busy.any(axis=1)
+        finished = self.active & idle
+        self.cycles[finished] = self.clock_cycles
+        self.active &= ~idle
+
+    def run_simulation(self, max_cycles=None):
+        """
+        运行直到所有配置结束或达到周期上限。
+
+        Args:
+        - max_cycles (int): 周期上限，None 表示不限；未结束的配置周期数为 -1
+
+        Returns:
+        - ndarray: 每个配置的总周期数
+        """
+        while self.active.any():
+            if max_cycles is not None and self.clock_cycles >= max_cycles:
+                break
+            self.step()
+        return self.cycles
+
+
+def run_reference(config, instructions, num_registers=11):
+    """
+    用对象模型 CPU 运行一个配置。
+
+    Input:
+    - config (dict): 配置字典
+    - instructions (list): 指令对象列表
+    - num_registers (int): 寄存器数量
+
+    Output:
+    - CPU: 运行结束的CPU对象
+    """
+    config = {**DEFAULT_CONFIG, **config}
+    cpu = CPU(num_registers=num_registers, memory_size=1024, instruction_queue=list(instructions), **config)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        cpu.run_simulation(None, keep_record=True)
+    return cpu
+
+
+def cross_check(configs, instructions, num_registers=11):
+    """
+    将批量引擎的结果与对象模型 CPU 逐个配置对拍。
+
+    Input:
+    - configs (list): 配置字典列表
+    - instructions (list): 指令对象列表，必须能在 CPU 上正常结束
+    - num_registers (int): 寄存器数量
+
+    Output:
+    - list: 不一致的 (配置, 说明) 列表，为空表示完全一致
+    """
+    batch = BatchCPU(configs, instructions, num_registers=num_registers, record_cycles=True)
+    batch.run_simulation()
+    mismatches = []
+    for b, config in enumerate(batch.configs):
+        cpu = run_reference(config, instructions, num_registers)
+        if cpu.clock_cycles != batch.cycles[b]:
+            mismatches.append((config, f"cycles {batch.cycles[b]} != {cpu.clock_cycles}"))
+            continue
+        for entry in cpu.reorder_buffer.rob_record:
+            expected = list(entry.state_cycle)
+            actual = [int(c) for c in batch.state_cycle[b, entry.rob_index - 1] if c >= 0]
+            if expected != actual:
+                mismatches.append((config, f"instruction {entry.rob_index}: {actual} != {expected}"))
+                break
+    return mismatches
+
+
+def config_grid(rob_entries, load_buffers, add_stations, mult_stations):
+    """
+    生成各配置项取值的笛卡尔积。
+
+    Input:
+    - rob_entries, load_buffers, add_stations, mult_stations (list): 各配置项的取值
+
+    Output:
+    - list: 配置字典列表
+    """
+    return [{"num_rob_entries": r, "num_load_buffers": l, "num_add_stations": a, "num_mult_stations": m}
+            for r, l, a, m in itertools.product(rob_entries, load_buffers, add_stations, mult_stations)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="在同一条指令序列上批量模拟多个CPU配置")
+    parser.add_argument("input", help="指令文件")
+    parser.add_argument("--rob", type=int, nargs="+", default=[2, 4, 6, 8], help="ROB 条目数取值")
+    parser.add_argument("--load-buffers", type=int, nargs="+", default=[1, 2, 3], help="Load Buffer 数量取值")
+    parser.add_argument("--add", type=int, nargs="+", default=[1, 2, 3], help="Add 保留站数量取值")
+    parser.add_argument("--mult", type=int, nargs="+", default=[1, 2], help="Mult 保留站数量取值")
+    parser.add_argument("--check", action="store_true", help="与对象模型 CPU 对拍")
+    args = parser.parse_args()
+
+    instructions = load_instructions(args.input)
+    grid = config_grid(args.rob, args.load_buffers, args.add, args.mult)
+    if args.check:
+        result = cross_check(grid, instructions)
+        for config, message in result:
+            print(config, message)
+        print(f"{len(grid) - len(result)}/{len(grid)} configurations match CPU.")
+    else:
+        cycles = BatchCPU(grid, instructions).run_simulation()
+        for config, cycle in zip(grid, cycles):
+            print(config, cycle)
@@ -0,0 +1,167 @@
+# benchmark.py
+"""
+模拟器性能基准：在不同指令序列长度与机器宽度下运行 CPU，
+记录每秒模拟的指令数与周期数、峰值内存以及输出文件大小，结果写入 JSON 便于跨版本比较。
+
+每个测试用例在新的子进程中运行，峰值内存（ru_maxrss）只反映该用例本身。
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from main import CPU, load_instructions
+from workload import write_trace
+
+# 机器宽度预设
+WIDTHS = {
+    "narrow": {"num_rob_entries": 4, "num_load_buffers": 1, "num_add_stations": 1, "num_mult_stations": 1},
+    "default": {"num_rob_entries": 6, "num_load_buffers": 2, "num_add_stations": 3, "num_mult_stations": 2},
+    "wide": {"num_rob_entries": 16, "num_load_buffers": 4, "num_add_stations": 6, "num_mult_stations": 4},
+}
+
+
+def run_case(trace_file, width, compiled, output_dir):
+    """
+    在当前进程中运行一个测试用例，应在独立的子进程中调用。
+
+    Input:
+    - trace_file (str): 指令文件
+    - width (str): 机器宽度预设名称
+    - compiled (bool): 是否使用编译模式
+    - output_dir (str): 周期状态输出文件所在目录
+
+    Output:
+    - dict: 测试结果
+    """
+    instructions = load_instructions(trace_file, lazy=True)
+    output_file = os.path.join(output_dir, f"{width}-{int(compiled)}-{os.getpid()}.txt")
+    cpu = CPU(num_registers=11, memory_size=1024, instruction_queue=instructions, compiled=compiled,
+              **WIDTHS[width])
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        cpu.run_simulation(output_file)
+    elapsed = time.perf_counter() - start
+    output_bytes = os.path.getsize(output_file)
+    os.remove(output_file)
+    return {
+        "instructions": cpu.reorder_buffer.committed,
+        "cycles": cpu.clock_cycles,
+        "seconds": elapsed,
+        "instructions_per_second": cpu.reorder_buffer.committed / elapsed,
+        "cycles_per_second": cpu.clock_cycles / elapsed,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "output_bytes": output_bytes,
+    }
+
+
+def git_version():
+    """
+    返回当前源码的 git 版本描述，不在 git 仓库中时返回 None。
+
+    Output:
+    - str or None: git describe 的结果
+    """
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes, widths, engines, seed=0, repeat=1):
+    """
+    运行全部测试用例。
+
+    Input:
+    - sizes (list): 指令序列长度
+    - widths (list): 机器宽度预设名称
+    - engines (list): "interpreted" 和/或 "compiled"
+    - seed (int): 合成序列的随机种子
+    - repeat (int): 每个用例重复次数，取最快的一次
+
+    Output:
+    - dict: 包含环境信息与各用例结果的报告
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            trace_file = os.path.join(tmp, f"trace-{size}.txt")
+            write_trace(trace_file, size, seed=seed)
+            for width in widths:
+                for engine in engines:
+                    best = None
+                    for _ in range(repeat):
+                        # 每次使用新的子进程，保证峰值内存互不影响
+                        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                            result = pool.submit(run_case, trace_file, width, engine == "compiled", tmp).result()
+                        if best is None or result["seconds"] < best["seconds"]:
+                            best = result
+                    best.update({"size": size, "width": width, "engine": engine})
+                    results.append(best)
+                    print(f"size={size} width={width} engine={engine}: "
+                          f"{best['instructions_per_second']:.0f} ins/s, {best['cycles_per_second']:.0f} cycles/s, "
+                          f"{best['peak_rss_kb']} KB, {best['output_bytes']} B")
+    return {
+        "version": git_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seed": seed,
+        "results": results,
+    }
+
+
+def compare(baseline, current):
+    """
+    比较两份报告中相同用例的吞吐率与资源占用。
+
+    Input:
+    - baseline (dict): 基准报告
+    - current (dict): 当前报告
+
+    Output:
+    - list: 每个共同用例的比较结果字符串
+    """
+    def key(result):
+        return result["size"], result["width"], result["engine"]
+
+    old = {key(r): r for r in baseline["results"]}
+    lines = []
+    for result in current["results"]:
+        before = old.get(key(result))
+        if before is None:
+            continue
+        speedup = result["instructions_per_second"] / before["instructions_per_second"]
+        lines.append(f"size={result['size']} width={result['width']} engine={result['engine']}: "
+                     f"speedup {speedup:.2f}x, rss {before['peak_rss_kb']} -> {result['peak_rss_kb']} KB, "
+                     f"output {before['output_bytes']} -> {result['output_bytes']} B")
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="模拟器性能基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="指令序列长度")
+    parser.add_argument("--widths", nargs="+", choices=list(WIDTHS), default=list(WIDTHS), help="机器宽度")
+    parser.add_argument("--engines", nargs="+", choices=["interpreted", "compiled"],
+                        default=["interpreted", "compiled"], help="模拟方式")
+    parser.add_argument("--seed", type=int, default=0, help="合成序列的随机种子")
+    parser.add_argument("--repeat", type=int, default=1, help="每个用例重复次数，取最快的一次")
+    parser.add_argument("--output", default="benchmark.json", help="结果 JSON 文件")
+    parser.add_argument("--compare", help="与之前的结果 JSON 比较")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.sizes, args.widths, args.engines, seed=args.seed, repeat=args.repeat)
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            for line in compare(json.load(file), report):
+                print(line)
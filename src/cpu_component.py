@@ -1,16 +1,16 @@
 # components.py
-rob_record = []
 
 
 class Instruction:
-    def __init__(self, opcode, destination, src1, src2):
+    def __init__(self, opcode, destination, src1, src2, line=None):
         """
-        指令类：包含指令的操作数、原地址、目标地址
+        指令类：包含指令的操作数、原地址、目标地址，以及在指令文件中的行号
         """
         self.opcode = opcode
         self.destination = destination
         self.src1 = src1
         self.src2 = src2
+        self.line = line
 
 
 class ReorderBufferEntry:
@@ -46,6 +46,10 @@ class ReorderBuffer:
         self.rob_index_counter = 0
         self.bus = bus
         self.rob_bus = rob_bus
+        self.rob_record = []  # 按提交顺序记录已提交的ROB条目，仅在 keep_record 时保留
+        self.keep_record = True
+        self.committed = 0  # 已提交的指令数
+        self.commits = []  # 本周期提交的ROB条目，每个周期开始时清空
 
     def issue_instruction(self, instruction, clock_cycle, vj, qj):
         """
@@ -111,7 +115,7 @@ class ReorderBuffer:
                     entry.state = "Commit"
                     self.new_head = (self.head + 1) % self.size
                     entry.state_cycle.append(clock_cycle)
-                    rob_record.append(entry)
+                    self.commit(entry)
             if label and entry.rob_index == label:  # 使用接收到的数据更新条目
                 entry.value = data
                 entry.state = "Write result"  # 尝试写寄存器
@@ -152,9 +156,24 @@ class ReorderBuffer:
             self.new_head = (self.head + 1) % self.size
             entry.state_cycle.append(clock_cycle - 1)
             entry.state_cycle.append(clock_cycle)
-            rob_record.append(entry)
+            self.commit(entry)
         return
 
+    def commit(self, entry):
+        """
+        记录一条已提交的指令。
+
+        Args:
+        - entry (ReorderBufferEntry): 已提交的ROB条目
+
+        Returns:
+        - None
+        """
+        self.committed += 1
+        self.commits.append(entry)
+        if self.keep_record:
+            self.rob_record.append(entry)
+
     # 当没有rs的时候需要回滚rob
     def clear_rob(self):
         """
@@ -0,0 +1,190 @@
+# dse.py
+"""
+提前终止的设计空间搜索：在面积/成本预算内搜索 ROB 大小、各浮点部件保留站数量与 Load Buffer 数量，
+使指令序列的总周期数最小。
+
+搜索采用逐级减半（successive halving）：
+- 先在指令序列的较短前缀上评估全部候选配置，只保留最好的 1/eta 进入下一级
+- 每一级前缀长度乘以 eta，最后一级在完整序列上评估
+- 每一级中，一旦某次运行的周期数超过当前能晋级的最差成绩（最后一级即当前最优），立即终止该运行
+
+公共数据总线（CDB）数量不在搜索空间中：模拟器只实现了一条 Bus。
+"""
+import argparse
+import contextlib
+import itertools
+import math
+import os
+
+from main import CPU, load_instructions
+from sim_watchdog import SimulationStalled
+
+# 默认的面积模型：每个部件条目的相对成本
+DEFAULT_COSTS = {"num_rob_entries": 1.0, "num_load_buffers": 1.0, "num_add_stations": 1.5,
+                 "num_mult_stations": 2.5}
+
+
+class SimulationAborted(Exception):
+    """运行周期数超过上限，模拟被提前终止。"""
+
+
+class CycleLimit:
+    def __init__(self, limit):
+        """
+        CPU观察者：周期数超过上限时终止模拟。
+
+        Args:
+        - limit (int or None): 周期上限，None 表示不限
+        """
+        self.limit = limit
+
+    def on_cycle(self, cpu):
+        if self.limit is not None and cpu.clock_cycles > self.limit:
+            raise SimulationAborted()
+
+    def on_finish(self, cpu):
+        pass
+
+
+def linear_cost(config, costs=None):
+    """
+    按部件条目数线性计算配置的面积/成本。
+
+    Input:
+    - config (dict): 配置字典
+    - costs (dict): 各配置项每个条目的成本，默认 DEFAULT_COSTS
+
+    Output:
+    - float: 成本
+    """
+    costs = costs if costs else DEFAULT_COSTS
+    return sum(costs[key] * config[key] for key in costs)
+
+
+def evaluate(config, instructions, limit=None, num_registers=11):
+    """
+    在给定配置上运行指令序列。
+
+    Input:
+    - config (dict): 配置字典
+    - instructions (list): 指令对象列表
+    - limit (int or None): 周期上限，超过时终止
+    - num_registers (int): 寄存器数量
+
+    Output:
+    - tuple: (总周期数，被终止或长时间没有提交时为 None；实际模拟的周期数)
+    """
+    cpu = CPU(num_registers=num_registers, memory_size=1024, instruction_queue=instructions,
+              observers=[CycleLimit(limit)], compiled=True, **config)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            cpu.run_simulation(None)
+        except (SimulationAborted, SimulationStalled):
+            return None, cpu.clock_cycles
+    return cpu.clock_cycles, cpu.clock_cycles
+
+
+def candidate_configs(space, budget, cost=linear_cost):
+    """
+    枚举搜索空间中满足预算的配置。
+
+    Input:
+    - space (dict): 配置项到候选取值列表的映射
+    - budget (float): 成本上限
+    - cost (function): 成本函数，参数为配置字典
+
+    Output:
+    - list: 配置字典列表
+    """
+    keys = list(space)
+    configs = [dict(zip(keys, values)) for values in itertools.product(*(space[key] for key in keys))]
+    return [config for config in configs if cost(config) <= budget]
+
+
+def successive_halving(instructions, space, budget, cost=linear_cost, eta=3, min_prefix=100, log=None):
+    """
+    在预算内搜索总周期数最小的配置。
+
+    Input:
+    - instructions (list): 完整指令序列
+    - space (dict): 配置项到候选取值列表的映射
+    - budget (float): 成本上限
+    - cost (function): 成本函数，参数为配置字典
+    - eta (int): 每一级保留 1/eta 的候选，前缀长度乘以 eta，至少为2
+    - min_prefix (int): 第一级前缀的最短长度
+    - log (function): 每次评估后调用 log(rung, prefix, config, cycles)，cycles 为 None 表示被终止或运行无效
+
+    Output:
+    - dict: 最优配置、其周期数与成本，以及搜索过程中实际模拟的总周期数
+    """
+    if eta < 2:
+        raise ValueError("eta must be at least 2.")
+    candidates = candidate_configs(space, budget, cost)
+    if not candidates:
+        raise ValueError("No configuration fits in the budget.")
+    total = len(instructions)
+    rungs = max(0, math.ceil(math.log(len(candidates), eta))) if len(candidates) > 1 else 0
+    prefix = min(total, max(min_prefix, math.ceil(total / eta ** rungs)))
+    simulated = 0
+    rung = 0
+    while True:
+        final = prefix >= total or len(candidates) == 1
+        if final:
+            prefix = total
+        keep = 1 if final else max(1, math.ceil(len(candidates) / eta))
+        results = []  # (周期数, 成本, 序号, 配置)，按成绩升序
+        for index, config in enumerate(candidates):
+            # 只有进入前 keep 名才能晋级，周期数超过当前第 keep 名即可终止
+            limit = results[keep - 1][0] if len(results) >= keep else None
+            cycles, spent = evaluate(config, instructions[:prefix], limit)
+            simulated += spent
+            if log:
+                log(rung, prefix, config, cycles)
+            if cycles is not None:
+                results.append((cycles, cost(config), index, config))
+                results.sort(key=lambda r: r[:3])
+        survivors = results[:keep]
+        if not survivors:
+            raise ValueError("No configuration in the budget completes the instruction sequence.")
+        if final:
+            cycles, config_cost, _, config = survivors[0]
+            return {"config": config, "cycles": cycles, "cost": config_cost, "simulated_cycles": simulated}
+        # 按本级成绩排序，后续级别中较好的配置先运行，上限会更早收紧
+        candidates = [r[3] for r in survivors]
+        prefix = min(total, prefix * eta)
+        rung += 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="在面积预算内搜索周期数最小的CPU配置")
+    parser.add_argument("input", help="指令文件")
+    parser.add_argument("--budget", type=float, required=True, help="成本上限")
+    parser.add_argument("--rob", type=int, nargs="+", default=[2, 4, 6, 8, 12, 16], help="ROB 条目数取值")
+    parser.add_argument("--load-buffers", type=int, nargs="+", default=[1, 2, 3, 4], help="Load Buffer 数量取值")
+    parser.add_argument("--add", type=int, nargs="+", default=[1, 2, 3, 4], help="Add 保留站数量取值")
+    parser.add_argument("--mult", type=int, nargs="+", default=[1, 2, 3], help="Mult 保留站数量取值")
+    parser.add_argument("--costs", type=float, nargs=4, metavar=("ROB", "LOAD", "ADD", "MULT"),
+                        default=[DEFAULT_COSTS[key] for key in DEFAULT_COSTS], help="各部件每个条目的成本")
+    parser.add_argument("--eta", type=int, default=3, help="每一级保留 1/eta 的候选")
+    parser.add_argument("--min-prefix", type=int, default=100, help="第一级前缀的最短长度")
+    parser.add_argument("--verbose", action="store_true", help="输出每次评估")
+    args = parser.parse_args()
+    if args.eta < 2:
+        parser.error("--eta must be at least 2")
+
+    weights = dict(zip(DEFAULT_COSTS, args.costs))
+    search_space = {"num_rob_entries": args.rob, "num_load_buffers": args.load_buffers,
+                    "num_add_stations": args.add, "num_mult_stations": args.mult}
+
+    def report(rung, prefix, config, cycles):
+        if args.verbose:
+            print(f"rung {rung} prefix {prefix}: {config} -> {cycles if cycles is not None else 'rejected'}")
+
+    try:
+        best = successive_halving(load_instructions(args.input), search_space, args.budget,
+                                  cost=lambda config: linear_cost(config, weights), eta=args.eta,
+                                  min_prefix=args.min_prefix, log=report)
+    except ValueError as error:
+        parser.error(str(error))
+    print(f"best: {best['config']} cycles={best['cycles']} cost={best['cost']} "
+          f"(simulated {best['simulated_cycles']} cycles in total)")
@@ -0,0 +1,253 @@
+# interval_sim.py
+"""
+单条长指令序列的区间并行模拟。
+
+指令序列被切分为 K 个连续区间，每个区间在独立的进程中模拟。区间 i 的模拟从区间起点之前 warmup 条指令开始
+（预热），使区间边界处的 ROB、保留站与寄存器状态接近串行模拟时的稳态。区间 i 贡献的周期数为
+其最后一条指令的提交周期减去预热部分最后一条指令的提交周期，最后一个区间以模拟结束的周期代替最后一次提交。
+各区间贡献之和即总周期数的估计；预热足够时与串行模拟结果相同。
+
+不含循环块的指令文件只在主进程中扫描一次，记录各区间预热起点所在的字节偏移；
+子进程从该偏移开始只解析本区间需要的指令行。含循环块的文件由各子进程完整解析后按展开顺序跳过。
+"""
+import argparse
+import contextlib
+import itertools
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from main import CPU, DEFAULT_CONFIG, expand_program, parse_program, program_length
+from workload import write_trace
+
+
+def split_intervals(length, intervals):
+    """
+    将指令序列切分为连续区间，各区间长度相差不超过1。
+
+    Input:
+    - length (int): 指令条数
+    - intervals (int): 区间数
+
+    Output:
+    - list: [(起点, 终点)]，左闭右开
+    """
+    intervals = max(1, min(intervals, length))
+    bounds = [length * i // intervals for i in range(intervals + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+class CommitCycles:
+    def __init__(self, warm):
+        """
+        CPU观察者：记录第 warm 条指令与最后一条指令的提交周期，不需要保留全部已提交的条目。
+
+        Args:
+        - warm (int): 预热指令条数
+        """
+        self.warm = warm
+        self.warm_cycle = 0  # 预热部分最后一条指令的提交周期
+        self.last_cycle = 0  # 最近一条指令的提交周期
+
+    def on_cycle(self, cpu):
+        rob = cpu.reorder_buffer
+        before = rob.committed - len(rob.commits)  # 本周期之前已提交的指令数
+        for number, entry in enumerate(rob.commits, start=before + 1):
+            if number == self.warm:
+                self.warm_cycle = entry.state_cycle[-1]
+            self.last_cycle = entry.state_cycle[-1]
+
+    def on_finish(self, cpu):
+        pass
+
+
+def index_trace(trace_file, positions):
+    """
+    扫描指令文件，不构造指令对象，统计指令条数并记录指定指令所在行的字节偏移。
+
+    Input:
+    - trace_file (str): 指令文件
+    - positions (iterable): 需要记录偏移的指令序号
+
+    Output:
+    - tuple: (指令条数, {指令序号: 字节偏移})；文件含循环块时偏移为 None，指令条数按展开后计算
+    """
+    wanted = set(positions)
+    offsets = {}
+    count = 0
+    offset = 0
+    with open(trace_file, 'rb') as file:
+        for line in file:
+            fields = line.split(None, 1)
+            if fields:
+                if fields[0] == b"LOOP":
+                    break
+                if count in wanted:
+                    offsets[count] = offset
+                count += 1
+            offset += len(line)
+        else:
+            return count, offsets
+    with open(trace_file) as file:
+        return program_length(parse_program(file)), None
+
+
+def simulate_interval(trace_file, start, end, warmup, last, config, num_registers=11, offset=None):
+    """
+    模拟一个区间（含预热部分），应在独立的子进程中调用。
+
+    Input:
+    - trace_file (str): 指令文件
+    - start, end (int): 区间的指令范围，左闭右开
+    - warmup (int): 预热指令条数
+    - last (bool): 是否为最后一个区间
+    - config (dict): 配置字典
+    - num_registers (int): 寄存器数量
+    - offset (int): 预热起点所在行的字节偏移，见 index_trace；None 表示解析整个文件
+
+    Output:
+    - dict: 区间贡献的周期数与模拟开销
+    """
+    warm_start = max(0, start - warmup)
+    if offset is None:
+        with open(trace_file) as file:
+            program = parse_program(file)
+        instructions = itertools.islice(expand_program(program, num_registers), warm_start, end)
+    else:  # 不含循环块：从偏移处开始只解析本区间的指令行
+        with open(trace_file, 'rb') as file:
+            file.seek(offset)
+            lines = (line.decode() for line in file if not line.isspace())
+            instructions = parse_program(itertools.islice(lines, end - warm_start))
+    warm = start - warm_start
+    commits = CommitCycles(warm)
+    cpu = CPU(num_registers=num_registers, memory_size=1024, instruction_queue=instructions, observers=[commits],
+              compiled=True, **config)
+    began = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        cpu.run_simulation(None)
+    committed = cpu.reorder_buffer.committed
+    if committed != end - warm_start:
+        raise RuntimeError(f"Interval [{start}, {end}) committed {committed} of {end - warm_start} instructions.")
+    end_cycle = cpu.clock_cycles if last else commits.last_cycle
+    return {
+        "start": start,
+        "end": end,
+        "warmup": warm,
+        "cycles": end_cycle - commits.warm_cycle,
+        "simulated_cycles": cpu.clock_cycles,
+        "seconds": time.perf_counter() - began,
+    }
+
+
+def run_intervals(trace_file, intervals, warmup, config=None, processes=None, num_registers=11):
+    """
+    区间并行模拟一个指令文件。
+
+    Input:
+    - trace_file (str): 指令文件
+    - intervals (int): 区间数
+    - warmup (int): 每个区间的预热指令条数
+    - config (dict): 配置字典，默认 DEFAULT_CONFIG
+    - processes (int): 并行进程数，默认等于区间数
+    - num_registers (int): 寄存器数量
+
+    Output:
+    - dict: 估计的总周期数与各区间结果
+    """
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    length, _ = index_trace(trace_file, ())
+    bounds = split_intervals(length, intervals)
+    _, offsets = index_trace(trace_file, (max(0, start - warmup) for start, _ in bounds))
+    with ProcessPoolExecutor(max_workers=processes or len(bounds), mp_context=get_context("spawn")) as pool:
+        futures = [pool.submit(simulate_interval, trace_file, start, end, warmup, i == len(bounds) - 1, config,
+                               num_registers, offsets.get(max(0, start - warmup)) if offsets is not None else None)
+                   for i, (start, end) in enumerate(bounds)]
+        results = [future.result() for future in futures]
+    return {"cycles": sum(r["cycles"] for r in results), "instructions": length, "intervals": results}
+
+
+def run_serial(trace_file, config=None, num_registers=11):
+    """
+    串行模拟完整指令文件，作为区间并行结果的基准。
+
+    Input:
+    - trace_file (str): 指令文件
+    - config (dict): 配置字典，默认 DEFAULT_CONFIG
+    - num_registers (int): 寄存器数量
+
+    Output:
+    - int: 总周期数
+    """
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    length, offsets = index_trace(trace_file, (0,))
+    offset = offsets.get(0) if offsets is not None else None
+    return simulate_interval(trace_file, 0, length, 0, True, config, num_registers, offset)["cycles"]
+
+
+def estimate_error(intervals, warmup, config=None, samples=5, length=20000, seed=0, processes=None):
+    """
+    在合成的样本指令序列上比较区间并行与串行模拟的总周期数。
+
+    Input:
+    - intervals (int): 区间数
+    - warmup (int): 预热指令条数
+    - config (dict): 配置字典
+    - samples (int): 样本序列数
+    - length (int): 每个样本序列的指令条数
+    - seed (int): 第一个样本的随机种子，之后依次加1
+    - processes (int): 并行进程数
+
+    Output:
+    - list: 每个样本的 (串行周期数, 区间并行周期数, 相对误差)
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for sample in range(samples):
+            trace_file = os.path.join(tmp, f"sample-{sample}.txt")
+            write_trace(trace_file, length, seed=seed + sample)
+            serial = run_serial(trace_file, config)
+            stitched = run_intervals(trace_file, intervals, warmup, config, processes)["cycles"]
+            rows.append((serial, stitched, (stitched - serial) / serial))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="区间并行模拟单条长指令序列")
+    parser.add_argument("input", nargs="?", help="指令文件")
+    parser.add_argument("--intervals", type=int, default=os.cpu_count(), help="区间数")
+    parser.add_argument("--warmup", type=int, default=1000, help="每个区间的预热指令条数")
+    parser.add_argument("--processes", type=int, help="并行进程数，默认等于区间数")
+    parser.add_argument("--rob", type=int, default=6, help="ROB 条目数")
+    parser.add_argument("--load-buffers", type=int, default=2, help="Load Buffer 数量")
+    parser.add_argument("--add", type=int, default=3, help="Add 保留站数量")
+    parser.add_argument("--mult", type=int, default=2, help="Mult 保留站数量")
+    parser.add_argument("--check", action="store_true", help="同时串行模拟并输出误差")
+    parser.add_argument("--samples", type=int, help="不指定指令文件，在若干合成样本上估计误差")
+    parser.add_argument("--sample-length", type=int, default=20000, help="合成样本的指令条数")
+    args = parser.parse_args()
+
+    cpu_config = {"num_rob_entries": args.rob, "num_load_buffers": args.load_buffers,
+                  "num_add_stations": args.add, "num_mult_stations": args.mult}
+    if args.samples:
+        errors = estimate_error(args.intervals, args.warmup, cpu_config, args.samples, args.sample_length,
+                                processes=args.processes)
+        for serial_cycles, stitched_cycles, error in errors:
+            print(f"serial {serial_cycles} stitched {stitched_cycles} error {error:+.4%}")
+        print(f"max |error| {max(abs(e[2]) for e in errors):.4%}")
+    elif args.input:
+        began = time.perf_counter()
+        result = run_intervals(args.input, args.intervals, args.warmup, cpu_config, args.processes)
+        elapsed = time.perf_counter() - began
+        for r in result["intervals"]:
+            print(f"[{r['start']}, {r['end']}) warmup {r['warmup']}: {r['cycles']} cycles "
+                  f"({r['simulated_cycles']} simulated, {r['seconds']:.2f}s)")
+        print(f"total {result['cycles']} cycles for {result['instructions']} instructions in {elapsed:.2f}s")
+        if args.check:
+            began = time.perf_counter()
+            serial_cycles = run_serial(args.input, cpu_config)
+            print(f"serial {serial_cycles} cycles in {time.perf_counter() - began:.2f}s, "
+                  f"error {(result['cycles'] - serial_cycles) / serial_cycles:+.4%}")
+    else:
+        parser.error("an input file or --samples is required")
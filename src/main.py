@@ -1,6 +1,18 @@
 # cpu.py
-from new_cpu import *
+from cpu_component import *
+from step_codegen import compile_cycle
+from sim_watchdog import Watchdog, InvariantChecker
+from collections import deque
+import contextlib
 import os
+import re
+
+# 浮点部件各操作的执行周期
+ADD_EXECUTION_CYCLES = {"ADDD": 2, "SUBD": 2}
+MULT_EXECUTION_CYCLES = {"MULTD": 10, "DIVD": 20}
+
+# 默认的部件配置，批量模拟与区间并行模拟中未指定的配置项取此值
+DEFAULT_CONFIG = {"num_rob_entries": 6, "num_load_buffers": 2, "num_add_stations": 3, "num_mult_stations": 2}
 
 
 def parse_instruction(line):
@@ -21,6 +33,185 @@ def parse_instruction(line):
     return Instruction(opcode, dest, src1, src2)
 
 
+class LoopBlock:
+    def __init__(self, count, strides, body):
+        """
+        循环块：循环体重复 count 次，每次迭代按步长平移寄存器编号与访存偏移。
+
+        Args:
+        - count (int): 迭代次数
+        - strides (tuple): 每次迭代 (F寄存器编号, R寄存器编号, 访存偏移) 的增量
+        - body (list): 循环体，元素为指令对象或嵌套的循环块
+        """
+        self.count = count
+        self.strides = strides
+        self.body = body
+        self.length = count * program_length(body)  # 展开后的指令条数
+
+
+def program_length(program):
+    """
+    计算程序展开后的指令条数。
+
+    Input:
+    - program (list): 指令对象与循环块组成的列表
+
+    Output:
+    - int: 指令条数
+    """
+    return sum(item.length if isinstance(item, LoopBlock) else 1 for item in program)
+
+
+def parse_program(lines):
+    """
+    将指令行解析为程序。除普通指令行外，支持循环块：
+
+        LOOP n [F+k] [R+k] [OFFSET+k] {
+        ...
+        }
+
+    F/R 步长为每次迭代寄存器编号的增量（按寄存器数量取模），OFFSET 为 LD/SD 偏移的增量，步长可为负数，循环可嵌套。
+
+    Input:
+    - lines (iterable): 指令行
+
+    Output:
+    - list: 指令对象与循环块组成的列表
+
+    Raises:
+    - ValueError: 指令行或循环块格式错误
+    """
+    stack = [[]]  # 正在解析的各层循环体
+    headers = []  # 尚未闭合的循环头 (行号, 次数, 步长)
+    for number, line in enumerate(lines, start=1):
+        fields = line.split()
+        if not fields:
+            continue
+        if fields[0] == "LOOP":
+            if len(fields) < 3 or fields[-1] != "{" or not fields[1].isdigit():
+                raise ValueError(f"Line {number}: expected 'LOOP n [F+k] [R+k] [OFFSET+k] {{'.")
+            strides = {"F": 0, "R": 0, "OFFSET": 0}
+            for stride in fields[2:-1]:
+                match = re.fullmatch(r"(F|R|OFFSET)([+-]\d+)", stride)
+                if match is None:
+                    raise ValueError(f"Line {number}: invalid stride {stride}.")
+                strides[match.group(1)] = int(match.group(2))
+            headers.append((number, int(fields[1]), (strides["F"], strides["R"], strides["OFFSET"])))
+            stack.append([])
+        elif fields == ["}"]:
+            if not headers:
+                raise ValueError(f"Line {number}: unmatched '}}'.")
+            _, count, strides = headers.pop()
+            body = stack.pop()
+            stack[-1].append(LoopBlock(count, strides, body))
+        else:
+            try:
+                instruction = parse_instruction(line.strip())
+            except IndexError:
+                raise ValueError(f"Line {number}: expected 'OP dest src1 src2'.")
+            instruction.line = number
+            stack[-1].append(instruction)
+    if headers:
+        raise ValueError(f"Line {headers[-1][0]}: LOOP is not closed.")
+    return stack[0]
+
+
+def shift_operand(operand, shift, num_registers):
+    """
+    按平移量修改一个操作数：寄存器编号按寄存器数量取模，立即数偏移直接相加。
+    """
+    f, r, offset = shift
+    if operand[0] in "FR" and operand[1:].isdigit():
+        delta = f if operand[0] == "F" else r
+        return f"{operand[0]}{(int(operand[1:]) + delta) % num_registers}"
+    if operand.lstrip("-").isdigit():
+        return str(int(operand) + offset)
+    return operand
+
+
+def expand_program(program, num_registers=11, shift=(0, 0, 0)):
+    """
+    按程序顺序逐条生成展开后的指令，不构造完整的指令列表。
+
+    Input:
+    - program (list): 指令对象与循环块组成的列表
+    - num_registers (int): 寄存器数量，寄存器编号平移时取模
+    - shift (tuple): 外层循环累计的 (F寄存器编号, R寄存器编号, 访存偏移) 平移量
+
+    Output:
+    - generator: 指令对象
+    """
+    for item in program:
+        if isinstance(item, LoopBlock):
+            df, dr, doffset = item.strides
+            for i in range(item.count):
+                yield from expand_program(item.body, num_registers,
+                                          (shift[0] + i * df, shift[1] + i * dr, shift[2] + i * doffset))
+        elif shift == (0, 0, 0):
+            yield item
+        else:
+            yield Instruction(item.opcode, *(shift_operand(operand, shift, num_registers)
+                                             for operand in (item.destination, item.src1, item.src2)), line=item.line)
+
+
+class InstructionStream:
+    def __init__(self, program, num_registers=11):
+        """
+        惰性展开的指令队列：取指时才生成下一条指令，接口与 CPU 使用的 deque 相同（判空、[0]、popleft、len）。
+
+        Args:
+        - program (list): 指令对象与循环块组成的列表
+        - num_registers (int): 寄存器数量
+        """
+        self.remaining = program_length(program)
+        self.instructions = expand_program(program, num_registers)
+        self.head = next(self.instructions, None)
+
+    def __bool__(self):
+        return self.head is not None
+
+    def __len__(self):
+        return self.remaining
+
+    def __getitem__(self, index):
+        if index != 0 or self.head is None:
+            raise IndexError("InstructionStream only supports access to the next instruction.")
+        return self.head
+
+    def popleft(self):
+        """
+        取出下一条指令。
+
+        Returns:
+        - Instruction: 指令对象
+        """
+        if self.head is None:
+            raise IndexError("pop from an empty InstructionStream")
+        instruction = self.head
+        self.head = next(self.instructions, None)
+        self.remaining -= 1
+        return instruction
+
+
+def load_instructions(input_file, lazy=False, num_registers=11):
+    """
+    读取指令文件并解析为指令队列，循环块见 parse_program。
+
+    Input:
+    - input_file (str): 指令文件路径
+    - lazy (bool): 是否返回惰性展开的 InstructionStream，否则返回完整展开的列表
+    - num_registers (int): 寄存器数量，循环步长平移寄存器编号时取模
+
+    Output:
+    - list or InstructionStream: 指令队列
+    """
+    with open(input_file, 'r') as file:
+        program = parse_program(file)
+    if lazy:
+        return InstructionStream(program, num_registers)
+    return list(expand_program(program, num_registers))
+
+
 def trans(ins):
     """
     将指令对象转换为标准输出格式。
@@ -86,51 +277,80 @@ def rs_state(rs_list):
 
 class CPU:
     def __init__(self, num_registers, memory_size, num_load_buffers, num_rob_entries,
-                 instruction_queue):
+                 instruction_queue, observers=None, num_add_stations=3, num_mult_stations=2, compiled=False,
+                 watchdog_cycles=10000, debug=False):
         self.bus = Bus()  # 创建总线
         self.rob_bus = Bus()  # 创建rob使用的数据bus
         self.register_group = RegisterGroup(num_registers, rob_bus=self.rob_bus)  # 创建寄存器组
         self.memory = Memory(memory_size, bus=self.bus, num_load_buffers=num_load_buffers)  # 创建内存
-        self.fp_add = FPUnit(unit_type="Add", num_reservation_stations=3, execution_cycles={
-            "ADDD": 2, "SUBD": 2
-        }, bus=self.bus)  # 创建浮点数执行单元
-        self.fp_multd = FPUnit(unit_type="Mult", num_reservation_stations=2, execution_cycles={
-            "MULTD": 10, "DIVD": 20
-        }, bus=self.bus)
+        self.fp_add = FPUnit(unit_type="Add", num_reservation_stations=num_add_stations,
+                             execution_cycles=ADD_EXECUTION_CYCLES, bus=self.bus)  # 创建浮点数执行单元
+        self.fp_multd = FPUnit(unit_type="Mult", num_reservation_stations=num_mult_stations,
+                               execution_cycles=MULT_EXECUTION_CYCLES, bus=self.bus)
         self.reorder_buffer = ReorderBuffer(num_rob_entries, bus=self.bus, rob_bus=self.rob_bus)
         self.clock_cycles = 0  # 初始化时钟周期计数
-        self.instruction_queue = instruction_queue  # 设置初始指令队列
-
-    def run_simulation(self):
+        # 设置初始指令队列，惰性展开的指令流直接使用
+        if isinstance(instruction_queue, InstructionStream):
+            self.instruction_queue = instruction_queue
+        else:
+            self.instruction_queue = deque(instruction_queue)
+        # 观察者：每个周期结束时调用 on_cycle(cpu)，模拟结束时调用 on_finish(cpu)
+        self.observers = list(observers) if observers else []
+        if watchdog_cycles:  # 连续 watchdog_cycles 个周期没有提交时终止并输出诊断快照
+            self.observers.append(Watchdog(watchdog_cycles))
+        if debug:  # 调试模式下每个周期检查 ROB、保留站与寄存器标签的一致性
+            self.observers.append(InvariantChecker())
+        self.compiled = compiled  # 是否使用为当前配置生成的专用单周期函数
+
+    def run_simulation(self, output_file=None, keep_record=None):
         """
         模拟CPU运行,运行时会输出各个周期的状态。
 
         输入:
         - self: 模拟器对象
+        - output_file (str): 周期状态输出文件路径；None 表示不输出，此时也不打印周期编号、不格式化各周期状态
+        - keep_record (bool): 是否在 reorder_buffer.rob_record 中保留全部已提交的条目，默认仅在输出文件时保留；
+          观察者应通过 reorder_buffer.commits 与 reorder_buffer.committed 获取提交情况
 
         输出:
         - 无
         """
-        with open(output_file, 'w') as output:
+        with open(output_file, 'w') if output_file is not None else contextlib.nullcontext() as output:
             # 用于判断前后两个周期是否输出相同的状态
             pre_state = ""
 
             # 用于计数相同状态的连续周期数
             same_counter = 0
 
+            # 不输出时跳过每周期的打印与状态格式化
+            quiet = output is None
+            # 每条指令的阶段周期只在写入输出文件时需要，长时间运行时不保留全部已提交的条目
+            self.reorder_buffer.keep_record = not quiet if keep_record is None else keep_record
+
+            if self.compiled:  # 使用为当前配置生成的专用函数
+                step, record = compile_cycle(self, trans, rs_state, quiet)
+            else:
+                step, record = self.step, self.record_component_state
+
             while True:
                 self.clock_cycles += 1  # 模拟时钟周期开始
-                print(f"clock Cycle：{self.clock_cycles}")
+                if not quiet:
+                    print(f"clock Cycle：{self.clock_cycles}")
 
-                self.issue_instructions()  # 阶段 1：发射指令
+                idle = step()
 
-                self.update_components()  # 阶段 2：更新各个组件
+                for observer in self.observers:  # 通知观察者本周期已结束
+                    observer.on_cycle(self)
 
-                self.register_group.update()  # 阶段 3：模拟写回
-                self.bus.update()
-                self.rob_bus.update()
+                if quiet:
+                    if idle:
+                        print("Simulation Complete.")
+                        for observer in self.observers:
+                            observer.on_finish(self)
+                        break
+                    continue
 
-                new_state = self.record_component_state()  # 记录组件状态到文件，包含处理重复输出操作
+                new_state = record()  # 记录组件状态到文件，包含处理重复输出操作
 
                 # 检查新状态是否与前一状态不同
                 if new_state != pre_state:
@@ -145,12 +365,14 @@ class CPU:
                 else:
                     same_counter += 1
 
-                if self.are_all_components_idle():  # 检查是否所有组件都处于空闲状态，如果是，则模拟结束
+                if idle:  # 检查是否所有组件都处于空闲状态，如果是，则模拟结束
                     output.write(f"cycle_{self.clock_cycles};\n")
                     output.write(pre_state)
                     print("Simulation Complete.")
+                    for observer in self.observers:
+                        observer.on_finish(self)
 
-                    for entry in rob_record:  # 按要求添加每条指令四个阶段代表周期
+                    for entry in self.reorder_buffer.rob_record:  # 按要求添加每条指令四个阶段代表周期
                         ins = entry.instruction
                         if entry is not None:
                             if entry.instruction.opcode == "SD":
@@ -161,6 +383,26 @@ class CPU:
                                     f"{ins.opcode} {ins.destination} {ins.src1} {ins.src2}: {entry.state_cycle[0]},{entry.state_cycle[1]},{entry.state_cycle[2]},{entry.state_cycle[3]}\n")
                     break
 
+    def step(self):
+        """
+        模拟一个时钟周期内的发射、执行与写回。
+
+        Inputs:
+        - None
+
+        Outputs:
+        - bool: 本周期结束后是否所有组件都处于空闲状态
+        """
+        self.reorder_buffer.commits.clear()  # 只保留本周期提交的条目
+        self.issue_instructions()  # 阶段 1：发射指令
+
+        self.update_components()  # 阶段 2：更新各个组件
+
+        self.register_group.update()  # 阶段 3：模拟写回
+        self.bus.update()
+        self.rob_bus.update()
+        return self.are_all_components_idle()
+
     def issue_instructions(self):
         """
         发射指令的函数:检查指令队列是否非空，然后根据指令类型调用相应的功能单元发射指令。
@@ -188,7 +430,7 @@ class CPU:
                 vj, qj = self.register_group.read(instruction.src1)
                 vk, qk = self.register_group.read(instruction.src2)
                 if self.fp_add.issue_instruction(instruction, vj, vk, qj, qk, rob_index):
-                    self.instruction_queue.pop(0)
+                    self.instruction_queue.popleft()
                     self.register_group.write(instruction.destination, rob_index)
                 else:
                     self.reorder_buffer.clear_rob()
@@ -196,19 +438,19 @@ class CPU:
                 vj, qj = self.register_group.read(instruction.src1)
                 vk, qk = self.register_group.read(instruction.src2)
                 if self.fp_multd.issue_instruction(instruction, vj, vk, qj, qk, rob_index):
-                    self.instruction_queue.pop(0)
+                    self.instruction_queue.popleft()
                     self.register_group.write(instruction.destination, rob_index)
                 else:
                     self.reorder_buffer.clear_rob()
             elif instruction.opcode == "LD":
                 vj, qj = self.register_group.read(instruction.src2)
                 if self.memory.issue_instruction(instruction, vj, qj, rob_index):
-                    self.instruction_queue.pop(0)
+                    self.instruction_queue.popleft()
                     self.register_group.write(instruction.destination, rob_index)
                 else:
                     self.reorder_buffer.clear_rob()
             elif instruction.opcode == "SD":
-                self.instruction_queue.pop(0)
+                self.instruction_queue.popleft()
                 return
             else:
                 raise ValueError(f"Error Instruction!")
@@ -282,7 +524,21 @@ class CPU:
         # 一次性写入文件
         return state_result
 
+    def all_stations(self):
+        """
+        按 Load、Add、Mult 的顺序返回全部保留站。
+
+        Inputs:
+        - None
+
+        Outputs:
+        - list: 保留站对象列表
+        """
+        return self.memory.load_buffers + self.fp_add.reservation_stations + self.fp_multd.reservation_stations
+
     def are_all_components_idle(self):
+        if self.instruction_queue:  # 还有指令未发射
+            return False
         if not self.fp_add.finish():
             return False
         if not self.fp_multd.finish():
@@ -301,12 +557,8 @@ if __name__ == "__main__":
     input_file = os.path.join(parent_dir, 'input', 'input1.txt')
     output_file = os.path.join(parent_dir, 'output', 'output1.txt')
     # 解析输入文件中的指令并存储到指令队列
-    ins_queue = []
-    with open(input_file, 'r') as file:
-        for line in file:  # 每一行都是一个指令
-            instruction = parse_instruction(line.strip())
-            ins_queue.append(instruction)
+    ins_queue = load_instructions(input_file, lazy=True)
     # 初始化CPU并运行模拟器
     cpu = CPU(num_registers=11, memory_size=1024, num_load_buffers=2, num_rob_entries=6,
               instruction_queue=ins_queue)
-    cpu.run_simulation()
+    cpu.run_simulation(output_file)
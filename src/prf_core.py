@@ -0,0 +1,436 @@
+# prf_core.py
+"""
+物理寄存器堆重命名模型：与 main.CPU 并列的另一种核心组织方式。
+
+- 结果不再存放在 ROB 条目中，而是写入合并的物理寄存器堆（PRF），F 体系结构寄存器都映射到同一个 PRF；
+  R 基址寄存器从不被写入，不参与重命名，读取时总是就绪
+- 发射时通过重命名映射表读取源操作数的物理寄存器，并从空闲列表为目的寄存器分配新的物理寄存器
+- 提交时释放该体系结构寄存器之前映射的物理寄存器
+- ROB 只记录指令状态与重命名信息，大小与寄存器数量无关
+
+发射的流水阶段与各部件延迟与 main.CPU 保持一致（单发射、单条 CDB、每周期最多提交一条），
+便于比较 ROB 大小与物理寄存器数量分别对指令窗口的限制。无法发射的周期按缺少的资源
+（ROB 条目、保留站、空闲物理寄存器）分别计数，同一周期可能同时缺少多种资源。
+"""
+import argparse
+import contextlib
+import os
+import re
+from collections import deque
+
+from cpu_component import ReservationStation
+from main import CPU, ADD_EXECUTION_CYCLES, MULT_EXECUTION_CYCLES, load_instructions, trans
+
+STALL_REASONS = ("rob", "station", "register")
+
+
+class PhysicalRegisterFile:
+    def __init__(self, num_physical, arch_names):
+        """
+        合并的物理寄存器堆，包含重命名映射表与空闲列表。
+
+        Args:
+        - num_physical (int): 物理寄存器数量
+        - arch_names (list): 体系结构寄存器名，初始时依次映射到前 len(arch_names) 个物理寄存器
+        """
+        if num_physical <= len(arch_names):
+            raise ValueError(f"Need more than {len(arch_names)} physical registers for "
+                             f"{len(arch_names)} architectural registers.")
+        self.values = [f"Regs[{name}]" for name in arch_names] + [""] * (num_physical - len(arch_names))
+        self.ready = [True] * num_physical
+        self.map = {name: i for i, name in enumerate(arch_names)}  # 重命名映射表
+        self.free = deque(range(len(arch_names), num_physical))  # 空闲列表
+
+    def rename(self, name):
+        """
+        为体系结构寄存器分配新的物理寄存器。
+
+        Args:
+        - name (str): 体系结构寄存器名
+
+        Returns:
+        - tuple: (新的物理寄存器, 之前映射的物理寄存器)
+        """
+        if name not in self.map:
+            raise ValueError(f"{name} is not a renamed register.")
+        new = self.free.popleft()
+        old = self.map[name]
+        self.map[name] = new
+        self.ready[new] = False
+        return new, old
+
+    def release(self, physical):
+        self.free.append(physical)
+
+    def in_use(self):
+        return len(self.values) - len(self.free)
+
+
+def operand_name(operand):
+    """
+    操作数的符号表示：物理寄存器为 P编号，未重命名的体系结构寄存器为 Regs[寄存器名]。
+    """
+    return f"P{operand}" if isinstance(operand, int) else f"Regs[{operand}]"
+
+
+class RenamedEntry:
+    def __init__(self, rob_index, instruction):
+        """
+        ROB条目：只记录指令状态与重命名信息，结果写入物理寄存器堆。
+        """
+        self.rob_index = rob_index
+        self.instruction = instruction
+        self.state = "Issue"
+        self.dest = None  # 目的物理寄存器
+        self.old = None  # 提交时释放的物理寄存器
+        self.data = None  # SD 的数据物理寄存器
+        self.issue_this_cycle = True
+        self.state_cycle = []
+
+
+class PRFCPU:
+    def __init__(self, num_registers, num_physical_registers, num_rob_entries, instruction_queue,
+                 num_load_buffers=2, num_add_stations=3, num_mult_stations=2, observers=None):
+        """
+        物理寄存器堆重命名模型。
+
+        Args:
+        - num_registers (int): F 体系结构寄存器数量，均参与重命名
+        - num_physical_registers (int): 物理寄存器数量，需大于 num_registers（只有 F 寄存器参与重命名）
+        - num_rob_entries (int): ROB 条目数，与寄存器数量无关
+        - instruction_queue (list or InstructionStream): 指令队列
+        - num_load_buffers, num_add_stations, num_mult_stations (int): 各类保留站数量
+        - observers (list): 观察者，每个周期结束时调用 on_cycle(cpu)，结束时调用 on_finish(cpu)
+        """
+        self.prf = PhysicalRegisterFile(num_physical_registers, [f"F{i}" for i in range(num_registers)])
+        self.rob = deque()
+        self.rob_size = num_rob_entries
+        self.rob_index_counter = 0
+        self.rob_record = []  # 按提交顺序记录已提交的ROB条目
+        self.load_buffers = [ReservationStation(name=f"Load{i + 1}") for i in range(num_load_buffers)]
+        self.add_stations = [ReservationStation(name=f"Add{i + 1}") for i in range(num_add_stations)]
+        self.mult_stations = [ReservationStation(name=f"Mult{i + 1}") for i in range(num_mult_stations)]
+        self.stations = self.load_buffers + self.add_stations + self.mult_stations
+        self.cdb = None  # 本周期总线上的 (物理寄存器, 值, ROB编号)
+        self.cdb_next = None
+        self.instruction_queue = instruction_queue if hasattr(instruction_queue, "popleft") else deque(
+            instruction_queue)
+        self.observers = observers if observers else []
+        self.clock_cycles = 0
+        self.stalls = dict.fromkeys(STALL_REASONS, 0)  # 各资源不足导致无法发射的周期数
+        self.stall_cycles = 0  # 无法发射的总周期数
+        self.cdb_conflicts = 0  # 因总线被占用而推迟写回的次数
+        self.rob_occupancy = 0  # 每周期 ROB 占用之和
+        self.registers_in_use = 0  # 每周期已分配物理寄存器数之和
+        self.peak_registers = self.prf.in_use()
+
+    def unit_for(self, opcode):
+        if opcode == "LD":
+            return self.load_buffers
+        if opcode in ADD_EXECUTION_CYCLES:
+            return self.add_stations
+        if opcode in MULT_EXECUTION_CYCLES:
+            return self.mult_stations
+        if opcode == "SD":
+            return None
+        raise ValueError(f"Error Instruction!")
+
+    def source(self, name):
+        """
+        读取源操作数：F 寄存器返回当前映射的物理寄存器，不参与重命名的 R 寄存器返回寄存器名本身。
+        """
+        if name in self.prf.map:
+            return self.prf.map[name]
+        if re.fullmatch(r"R\d+", name):
+            return name
+        raise ValueError(f"Invalid register {name}.")
+
+    def ready(self, operand):
+        return not isinstance(operand, int) or self.prf.ready[operand]
+
+    def issue_instruction(self):
+        """
+        发射队首指令：需要空闲的 ROB 条目、保留站，有目的寄存器时还需要空闲的物理寄存器。
+
+        Returns:
+        - None
+        """
+        if not self.instruction_queue:
+            return
+        ins = self.instruction_queue[0]
+        unit = self.unit_for(ins.opcode)
+        station = next((rs for rs in unit if not rs.busy), None) if unit is not None else None
+        blocked = []
+        if len(self.rob) >= self.rob_size:
+            blocked.append("rob")
+        if unit is not None and station is None:
+            blocked.append("station")
+        if ins.opcode != "SD" and not self.prf.free:
+            blocked.append("register")
+        if blocked:
+            self.stall_cycles += 1
+            for reason in blocked:
+                self.stalls[reason] += 1
+            return
+        self.instruction_queue.popleft()
+        self.rob_index_counter += 1
+        entry = RenamedEntry(self.rob_index_counter, ins)
+        entry.state_cycle.append(self.clock_cycles)
+        self.rob.append(entry)
+        if ins.opcode == "SD":
+            entry.data = self.source(ins.destination)
+            return
+        # 先读源操作数的映射，再为目的寄存器重命名
+        sources = [ins.src2] if ins.opcode == "LD" else [ins.src1, ins.src2]
+        tags = [self.source(name) for name in sources]
+        entry.dest, entry.old = self.prf.rename(ins.destination)
+        station.busy = True
+        station.op = ins.opcode
+        station.rob_index = entry.rob_index
+        station.dest = entry.dest
+        station.a = ins.src1
+        station.vj = tags[0]
+        station.vk = tags[-1] if ins.opcode != "LD" else None
+        station.qj = None if self.ready(tags[0]) else tags[0]
+        station.qk = None if station.vk is None or self.ready(station.vk) else station.vk
+        station.remain_time = 2 if ins.opcode == "LD" else {**ADD_EXECUTION_CYCLES, **MULT_EXECUTION_CYCLES}[
+            ins.opcode]
+        station.issue_this_cycle = True
+
+    def result(self, rs):
+        """
+        生成执行结果的符号表示。
+        """
+        if rs.op == "LD":
+            return f"Mem[{rs.a}+{operand_name(rs.vj)}]"
+        operator = {"ADDD": "+", "SUBD": "-", "MULTD": "*", "DIVD": "/"}[rs.op]
+        return f"{operand_name(rs.vj)} {operator} {operand_name(rs.vk)}"
+
+    def update_stations(self, entries):
+        """
+        更新各保留站：从总线取得操作数、执行、写总线。
+
+        Args:
+        - entries (dict): ROB编号 -> 在途的ROB条目
+
+        Returns:
+        - None
+        """
+        for rs in self.stations:
+            if not rs.busy:
+                continue
+            if rs.remain_time == 0:  # 上一周期已写上总线，释放保留站
+                rs.busy = False
+                continue
+            if rs.qj is not None or rs.qk is not None:
+                if self.cdb is not None:
+                    if rs.qj == self.cdb[0]:
+                        rs.qj = None
+                    if rs.qk == self.cdb[0]:
+                        rs.qk = None
+                rs.issue_this_cycle = False
+                continue  # 本周期取得操作数的指令下个周期开始执行
+            if rs.issue_this_cycle:  # 发射需要一个周期
+                rs.issue_this_cycle = False
+                continue
+            entries[rs.rob_index].state = "Exec"
+            rs.remain_time -= 1
+            if rs.remain_time == 0:
+                if self.cdb_next is None:
+                    self.cdb_next = (rs.dest, self.result(rs), rs.rob_index)
+                else:  # 总线已被占用，下个周期重试
+                    rs.remain_time = 1
+                    self.cdb_conflicts += 1
+
+    def update_reorder_buffer(self, entries):
+        """
+        提交头部条目并处理总线上的写回。
+
+        Args:
+        - entries (dict): ROB编号 -> 在途的ROB条目
+
+        Returns:
+        - None
+        """
+        if self.rob:
+            head = self.rob[0]
+            if head.instruction.opcode == "SD":
+                done = head.state == "Exec" and self.ready(head.data)
+            else:
+                done = head.state == "Write result"
+            if done:
+                self.rob.popleft()
+                head.state = "Commit"
+                if head.instruction.opcode == "SD":
+                    head.state_cycle.append(self.clock_cycles - 1)
+                head.state_cycle.append(self.clock_cycles)
+                self.rob_record.append(head)
+                if head.old is not None:  # 之前的映射不会再被读取，回收
+                    self.prf.release(head.old)
+        for entry in self.rob:
+            if entry.instruction.opcode == "SD" and entry.state == "Issue":
+                if entry.issue_this_cycle:
+                    entry.issue_this_cycle = False
+                else:
+                    entry.state = "Exec"
+        if self.cdb is not None:
+            physical, value, rob_index = self.cdb
+            self.prf.values[physical] = value
+            self.prf.ready[physical] = True
+            entry = entries[rob_index]
+            entry.state = "Write result"
+            entry.state_cycle.append(self.clock_cycles - 1)
+            entry.state_cycle.append(self.clock_cycles)
+
+    def step(self):
+        """
+        模拟一个时钟周期。
+
+        Returns:
+        - bool: 本周期结束后是否所有组件都处于空闲状态
+        """
+        self.issue_instruction()
+        entries = {entry.rob_index: entry for entry in self.rob}
+        self.update_stations(entries)
+        self.update_reorder_buffer(entries)
+        self.cdb, self.cdb_next = self.cdb_next, None
+        self.rob_occupancy += len(self.rob)
+        in_use = self.prf.in_use()
+        self.registers_in_use += in_use
+        self.peak_registers = max(self.peak_registers, in_use)
+        return not self.instruction_queue and not self.rob and not any(rs.busy for rs in self.stations)
+
+    def record_component_state(self):
+        """
+        记录 ROB、保留站、重命名映射表与空闲列表的状态。
+
+        Returns:
+        - str: 格式化的状态字符串
+        """
+        state_result = ""
+        for i in range(self.rob_size):
+            if i < len(self.rob):
+                entry = self.rob[i]
+                dest = f"P{entry.dest}" if entry.dest is not None else operand_name(entry.data)
+                old = f"P{entry.old}" if entry.old is not None else ""
+                state_result += f"entry{i + 1} : Yes, {trans(entry.instruction)}, {entry.state}, {dest}, {old};\n"
+            else:
+                state_result += f"entry{i + 1} :No,,,,;\n"
+        for rs in self.stations:
+            if not rs.busy:
+                state_result += f"{rs.name} : NO,,,,,,;\n"
+                continue
+            vk = operand_name(rs.vk) if rs.vk is not None else ""
+            qj = f"P{rs.qj}" if rs.qj is not None else ""
+            qk = f"P{rs.qk}" if rs.qk is not None else ""
+            state_result += (f"{rs.name} : Yes, {rs.op}, {operand_name(rs.vj)}, {vk}, {qj}, {qk}, "
+                             f"#{rs.rob_index}, P{rs.dest};\n")
+        state_result += "Map:" + "".join(f"{name}:P{physical};" for name, physical in self.prf.map.items()) + "\n"
+        state_result += f"Free:{len(self.prf.free)};\n"
+        state_result += "------------------------------------\n"
+        return state_result
+
+    def run_simulation(self, output_file=None):
+        """
+        运行直到所有组件空闲。
+
+        Args:
+        - output_file (str): 周期状态输出文件，格式与 main.CPU 相同（连续相同的状态合并），None 表示不输出
+
+        Returns:
+        - dict: 运行统计，见 summary
+        """
+        output = open(output_file, 'w') if output_file else None
+        try:
+            pre_state = ""
+            first = 1  # pre_state 开始的周期
+            while True:
+                self.clock_cycles += 1
+                idle = self.step()
+                for observer in self.observers:
+                    observer.on_cycle(self)
+                if output:
+                    new_state = self.record_component_state()
+                    if new_state != pre_state:
+                        if pre_state:
+                            span = f"{first}-{self.clock_cycles - 1}" if first < self.clock_cycles - 1 else first
+                            output.write(f"cycle_{span};\n{pre_state}")
+                        pre_state = new_state
+                        first = self.clock_cycles
+                if idle:
+                    break
+            if output:
+                span = f"{first}-{self.clock_cycles}" if first < self.clock_cycles else first
+                output.write(f"cycle_{span};\n{pre_state}")
+                for entry in self.rob_record:
+                    ins = entry.instruction
+                    output.write(f"{ins.opcode} {ins.destination} {ins.src1} {ins.src2}: "
+                                 f"{','.join(str(cycle) for cycle in entry.state_cycle)}\n")
+            for observer in self.observers:
+                observer.on_finish(self)
+        finally:
+            if output:
+                output.close()
+        return self.summary()
+
+    def summary(self):
+        """
+        返回运行统计。
+
+        Returns:
+        - dict: 周期数、提交的指令数、各资源导致的发射停顿周期、平均 ROB 占用与物理寄存器占用
+        """
+        cycles = max(1, self.clock_cycles)
+        return {
+            "cycles": self.clock_cycles,
+            "instructions": len(self.rob_record),
+            "stall_cycles": self.stall_cycles,
+            "stalls": dict(self.stalls),
+            "cdb_conflicts": self.cdb_conflicts,
+            "average_rob_occupancy": self.rob_occupancy / cycles,
+            "average_registers_in_use": self.registers_in_use / cycles,
+            "peak_registers_in_use": self.peak_registers,
+        }
+
+
+def format_summary(config, summary):
+    stalls = summary["stalls"]
+    return (f"rob={config['num_rob_entries']:>3} phys={config['num_physical_registers']:>3}: "
+            f"{summary['cycles']} cycles, IPC {summary['instructions'] / max(1, summary['cycles']):.3f}, "
+            f"issue stalls {summary['stall_cycles']} (rob {stalls['rob']}, station {stalls['station']}, "
+            f"register {stalls['register']}), ROB occupancy {summary['average_rob_occupancy']:.1f}, "
+            f"registers in use {summary['average_registers_in_use']:.1f} (peak {summary['peak_registers_in_use']})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="物理寄存器堆重命名模型")
+    parser.add_argument("input", help="指令文件")
+    parser.add_argument("--registers", type=int, default=11, help="F 体系结构寄存器数量，均参与重命名")
+    parser.add_argument("--rob", type=int, nargs="+", default=[6], help="ROB 条目数，可给出多个取值")
+    parser.add_argument("--phys-regs", type=int, nargs="+", help="物理寄存器数量，可给出多个取值，"
+                                                                  "默认为 registers+ROB 条目数")
+    parser.add_argument("--load-buffers", type=int, default=2, help="Load Buffer 数量")
+    parser.add_argument("--add", type=int, default=3, help="Add 保留站数量")
+    parser.add_argument("--mult", type=int, default=2, help="Mult 保留站数量")
+    parser.add_argument("--output", help="周期状态输出文件（仅单个配置）")
+    parser.add_argument("--compare", action="store_true", help="同时运行 main.CPU 并输出其周期数")
+    args = parser.parse_args()
+    if args.output and len(args.rob) * len(args.phys_regs or [None]) > 1:
+        parser.error("--output requires a single --rob and --phys-regs value")
+    if args.phys_regs and min(args.phys_regs) <= args.registers:
+        parser.error(f"--phys-regs must be greater than --registers ({args.registers})")
+
+    for rob_entries in args.rob:
+        for physical in args.phys_regs or [args.registers + rob_entries]:
+            config = {"num_rob_entries": rob_entries, "num_physical_registers": physical}
+            cpu = PRFCPU(args.registers, physical, rob_entries, load_instructions(args.input, lazy=True),
+                         num_load_buffers=args.load_buffers, num_add_stations=args.add,
+                         num_mult_stations=args.mult)
+            print(format_summary(config, cpu.run_simulation(args.output)))
+        if args.compare:
+            reference = CPU(num_registers=args.registers, memory_size=1024, num_load_buffers=args.load_buffers,
+                            num_rob_entries=rob_entries, instruction_queue=load_instructions(args.input, lazy=True),
+                            num_add_stations=args.add, num_mult_stations=args.mult, compiled=True)
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                reference.run_simulation(None)
+            print(f"rob={rob_entries:>3} main.CPU: {reference.clock_cycles} cycles")
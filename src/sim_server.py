@@ -0,0 +1,630 @@
+# sim_server.py
+"""
+本地异步模拟服务：通过 HTTP（TCP 或 Unix socket）接收 指令序列+配置 的任务，
+排队后交给常驻的 CPU 工作进程池执行，并把逐周期进度与最终结果流式返回。
+
+接口：
+- POST   /jobs              提交任务，返回 202 与任务 id；队列已满时返回 503（背压）
+- POST   /jobs?stream=1     提交任务并直接流式返回事件，客户端断开时取消任务
+- GET    /jobs/<id>         查询任务状态
+- GET    /jobs/<id>/events  流式返回任务事件；Accept 为 text/event-stream 时使用 SSE，否则为分块的 JSON 行
+- DELETE /jobs/<id>         取消排队中或运行中的任务
+
+任务请求体（JSON）：
+    {"trace": "LD F6 34+ R2\\n...", "config": {"num_rob_entries": 6, ...},
+     "compiled": false, "progress_interval": 1000, "include_output": false}
+
+工作进程常驻并复用，避免每次运行都付出解释器启动的代价。事件缓冲区有上限，
+慢速客户端只会跳过中间的进度事件，不会阻塞模拟；最终结果事件不会被丢弃。
+任务发送给工作进程后即释放其指令序列；服务只保留最近结束的若干个任务，更早的任务查询时返回 404。
+"""
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import sys
+import tempfile
+from collections import deque
+from multiprocessing import get_context
+from urllib.parse import urlsplit, parse_qs
+
+from main import CPU, InstructionStream, LoopBlock, parse_program
+
+# 允许客户端设置的CPU配置项及默认值
+CONFIG_KEYS = {"num_registers": 11, "num_rob_entries": 6, "num_load_buffers": 2,
+               "num_add_stations": 3, "num_mult_stations": 2}
+# 各配置项允许的最大值，避免单个请求耗尽工作进程的内存
+CONFIG_LIMITS = {"num_registers": 256, "num_rob_entries": 4096, "num_load_buffers": 256,
+                 "num_add_stations": 256, "num_mult_stations": 256}
+OPCODES = {"LD", "SD", "ADDD", "SUBD", "MULTD", "DIVD"}
+MAX_BODY = 64 * 1024 * 1024
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+class JobCancelled(Exception):
+    """任务在工作进程中被取消。"""
+
+
+class PayloadTooLarge(Exception):
+    """请求体超过 MAX_BODY。"""
+
+
+class ProgressReporter:
+    def __init__(self, conn, job_id, interval):
+        """
+        工作进程中的CPU观察者：每隔若干周期发送一次进度，并检查是否收到取消请求。
+
+        Args:
+        - conn: 与服务进程通信的管道
+        - job_id (int): 任务 id
+        - interval (int): 发送进度的周期间隔
+        """
+        self.conn = conn
+        self.job_id = job_id
+        self.interval = max(1, interval)
+
+    def on_cycle(self, cpu):
+        if cpu.clock_cycles % self.interval:
+            return
+        self.conn.send(("progress", self.job_id, {
+            "cycle": cpu.clock_cycles,
+            "committed": cpu.reorder_buffer.committed,
+            "pending": len(cpu.instruction_queue),
+        }))
+        while self.conn.poll():
+            if self.conn.recv() == ("cancel", self.job_id):
+                raise JobCancelled()
+
+    def on_finish(self, cpu):
+        pass
+
+
+def run_job(conn, job_id, job):
+    """
+    在工作进程中运行一个任务。
+
+    Input:
+    - conn: 与服务进程通信的管道
+    - job_id (int): 任务 id
+    - job (dict): 已校验的任务请求
+
+    Output:
+    - dict: 最终结果
+    """
+    instructions = InstructionStream(parse_program(job["trace"].splitlines()), job["config"]["num_registers"])
+    total = len(instructions)
+    reporter = ProgressReporter(conn, job_id, job["progress_interval"])
+    cpu = CPU(memory_size=1024, instruction_queue=instructions, observers=[reporter], compiled=job["compiled"],
+              **job["config"])
+    fd, output_file = tempfile.mkstemp(suffix=".txt")
+    os.close(fd)
+    try:
+        cpu.run_simulation(output_file, keep_record=True)
+        result = {
+            "cycles": cpu.clock_cycles,
+            "instructions": total,
+            "state_cycle": [[f"{e.instruction.opcode} {e.instruction.destination} {e.instruction.src1} "
+                             f"{e.instruction.src2}", e.state_cycle] for e in cpu.reorder_buffer.rob_record],
+        }
+        if job["include_output"]:
+            with open(output_file) as file:
+                result["output"] = file.read()
+        return result
+    finally:
+        os.remove(output_file)
+
+
+def worker_main(conn):
+    """
+    工作进程主循环：依次接收任务并回传进度与结果，收到 None 时退出。
+
+    Input:
+    - conn: 与服务进程通信的管道
+
+    Output:
+    - None
+    """
+    sys.stdout = open(os.devnull, 'w')  # CPU 每个周期都会打印，工作进程中丢弃
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:  # 服务进程已退出
+            break
+        if message is None:
+            break
+        if message[0] != "run":  # 已结束任务的迟到取消请求
+            continue
+        _, job_id, job = message
+        try:
+            conn.send(("result", job_id, run_job(conn, job_id, job)))
+        except JobCancelled:
+            conn.send(("cancelled", job_id, None))
+        except Exception as error:
+            conn.send(("error", job_id, repr(error)))
+
+
+def validate_job(body):
+    """
+    校验并补全任务请求。
+
+    Input:
+    - body (dict): 请求体
+
+    Output:
+    - dict: 补全默认值后的任务
+
+    Raises:
+    - ValueError: 请求格式错误
+    """
+    if not isinstance(body, dict) or not isinstance(body.get("trace"), str):
+        raise ValueError("'trace' must be a string of instructions.")
+    if not isinstance(body.get("config") or {}, dict):
+        raise ValueError("'config' must be an object.")
+    progress_interval = body.get("progress_interval", 1000)
+    if not isinstance(progress_interval, int) or isinstance(progress_interval, bool) or progress_interval < 1:
+        raise ValueError("'progress_interval' must be a positive integer.")
+    config = dict(CONFIG_KEYS)
+    for key, value in (body.get("config") or {}).items():
+        if key not in CONFIG_KEYS:
+            raise ValueError(f"Unknown config key: {key}")
+        if not isinstance(value, int) or isinstance(value, bool) or not 1 <= value <= CONFIG_LIMITS[key]:
+            raise ValueError(f"Config {key} must be an integer between 1 and {CONFIG_LIMITS[key]}.")
+        config[key] = value
+    # 提前发现格式错误，避免占用工作进程
+    blocks = [parse_program(body["trace"].splitlines())]
+    while blocks:
+        for item in blocks.pop():
+            if isinstance(item, LoopBlock):
+                blocks.append(item.body)
+            elif item.opcode not in OPCODES:
+                raise ValueError(f"Unsupported instruction {item.opcode}.")
+    return {
+        "trace": body["trace"],
+        "config": config,
+        "compiled": bool(body.get("compiled", False)),
+        "progress_interval": progress_interval,
+        "include_output": bool(body.get("include_output", False)),
+    }
+
+
+class Job:
+    def __init__(self, job_id, request, max_events):
+        """
+        服务进程中的任务记录。
+
+        Args:
+        - job_id (int): 任务 id
+        - request (dict): 已校验的任务请求
+        - max_events (int): 事件缓冲区上限，超出后丢弃最旧的进度事件
+        """
+        self.id = job_id
+        self.request = request
+        self.status = "queued"
+        self.events = deque(maxlen=max_events)
+        self.seq = 0  # 已产生的事件总数
+        self.finished = False
+        self.changed = asyncio.Condition()
+        self.worker = None
+
+    async def publish(self, kind, data, final=False):
+        """
+        追加一个事件并唤醒所有订阅者。
+
+        Args:
+        - kind (str): 事件类型
+        - data: 事件数据
+        - final (bool): 是否为最后一个事件
+
+        Returns:
+        - None
+        """
+        async with self.changed:
+            self.events.append((self.seq, kind, data))
+            self.seq += 1
+            if final:
+                self.finished = True
+            self.changed.notify_all()
+
+    async def subscribe(self):
+        """
+        依次产生任务事件，跟不上时跳过已被丢弃的进度事件。
+
+        Returns:
+        - async generator: (事件类型, 数据)
+        """
+        position = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: self.seq > position or self.finished)
+                batch = [event for event in self.events if event[0] >= position]
+                position = self.seq
+                finished = self.finished
+            for _, kind, data in batch:
+                yield kind, data
+            if finished:
+                return
+
+    def summary(self):
+        return {"id": self.id, "status": self.status, "events": self.seq}
+
+
+class Worker:
+    def __init__(self, server):
+        """
+        常驻的模拟工作进程及其管道。
+
+        Args:
+        - server (SimulationServer): 所属服务
+        """
+        self.server = server
+        self.conn, child = get_context("spawn").Pipe()
+        self.process = get_context("spawn").Process(target=worker_main, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        self.job = None
+        self.done = None
+
+    def start_job(self, job):
+        """
+        把任务发送给工作进程，并开始监听其回传的消息。
+
+        Args:
+        - job (Job): 待运行的任务
+
+        Returns:
+        - asyncio.Future: 任务结束时完成
+        """
+        loop = asyncio.get_running_loop()
+        self.job = job
+        self.done = loop.create_future()
+        job.worker = self
+        job.status = "running"
+        self.conn.send(("run", job.id, job.request))
+        job.request = None  # 指令序列已交给工作进程，不再保留
+        loop.add_reader(self.conn.fileno(), self.on_readable)
+        return self.done
+
+    def on_readable(self):
+        """
+        管道可读时取出全部消息并分发给任务。
+
+        Returns:
+        - None
+        """
+        try:
+            while self.conn.poll():
+                self.handle(*self.conn.recv())
+        except (EOFError, OSError):  # 工作进程意外退出
+            asyncio.get_running_loop().remove_reader(self.conn.fileno())
+            self.finish("error", "worker process exited")
+
+    def handle(self, kind, job_id, data):
+        job = self.job
+        if job is None or job_id != job.id:
+            return
+        if kind == "progress":
+            asyncio.ensure_future(job.publish("progress", data))
+        else:
+            self.finish(kind, data)
+
+    def finish(self, kind, data):
+        job = self.job
+        if job is None:
+            return
+        asyncio.get_running_loop().remove_reader(self.conn.fileno())
+        job.status = {"result": "done"}.get(kind, kind)
+        job.worker = None
+        self.job = None
+        asyncio.ensure_future(job.publish(kind, data, final=True))
+        self.server.retire(job)
+        self.done.set_result(kind)
+
+    def cancel(self, job):
+        if self.job is job:
+            self.conn.send(("cancel", job.id))
+
+    def stop(self):
+        with contextlib.suppress(OSError):
+            self.conn.send(None)
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class SimulationServer:
+    def __init__(self, num_workers, max_pending, max_events=1000, max_finished=256):
+        """
+        模拟服务：任务队列、工作进程池与 HTTP 接口。
+
+        Args:
+        - num_workers (int): 工作进程数量
+        - max_pending (int): 排队任务上限，超出时拒绝新任务
+        - max_events (int): 每个任务保留的事件数上限
+        - max_finished (int): 保留的已结束任务数上限，超出后移除最早结束的任务
+        """
+        self.num_workers = num_workers
+        self.max_events = max_events
+        self.max_finished = max_finished
+        self.pending = asyncio.Queue(maxsize=max_pending)
+        self.jobs = {}
+        self.finished = deque()  # 已结束任务的 id，按结束顺序
+        self.ids = itertools.count(1)
+        self.workers = []
+        self.tasks = []
+
+    async def start(self):
+        """
+        启动工作进程与调度协程。
+
+        Returns:
+        - None
+        """
+        for _ in range(self.num_workers):
+            worker = Worker(self)
+            self.workers.append(worker)
+            self.tasks.append(asyncio.ensure_future(self.dispatch(worker)))
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        for worker in self.workers:
+            worker.stop()
+
+    async def dispatch(self, worker):
+        """
+        调度协程：每个工作进程一个，从队列中取任务交给该进程。
+
+        Args:
+        - worker (Worker): 工作进程
+
+        Returns:
+        - None
+        """
+        while True:
+            job = await self.pending.get()
+            if job.status != "queued":  # 排队时已被取消
+                continue
+            if not worker.process.is_alive():  # 替换意外退出的工作进程
+                index = self.workers.index(worker)
+                worker = Worker(self)
+                self.workers[index] = worker
+            await worker.start_job(job)
+
+    def submit(self, request):
+        """
+        提交任务，队列已满时返回 None。
+
+        Args:
+        - request (dict): 已校验的任务请求
+
+        Returns:
+        - Job or None: 新任务
+        """
+        job = Job(next(self.ids), request, self.max_events)
+        try:
+            self.pending.put_nowait(job)
+        except asyncio.QueueFull:
+            return None
+        self.jobs[job.id] = job
+        return job
+
+    def retire(self, job):
+        """
+        记录已结束的任务，超过保留上限时移除最早结束的任务。
+
+        Args:
+        - job (Job): 已结束的任务
+
+        Returns:
+        - None
+        """
+        job.request = None
+        self.finished.append(job.id)
+        while len(self.finished) > self.max_finished:
+            self.jobs.pop(self.finished.popleft(), None)
+
+    async def cancel(self, job):
+        """
+        取消任务：排队中的直接结束，运行中的通知工作进程。
+
+        Args:
+        - job (Job): 待取消的任务
+
+        Returns:
+        - bool: 任务是否仍可取消
+        """
+        if job.finished:
+            return False
+        if job.status == "queued":
+            job.status = "cancelled"
+            await job.publish("cancelled", None, final=True)
+            self.retire(job)
+        elif job.worker is not None:
+            job.worker.cancel(job)
+        return True
+
+    async def handle_connection(self, reader, writer):
+        """
+        处理一个 HTTP 连接（每个连接一个请求）。
+
+        Args:
+        - reader (asyncio.StreamReader): 读端
+        - writer (asyncio.StreamWriter): 写端
+
+        Returns:
+        - None
+        """
+        try:
+            request = await read_request(reader)
+            if request is None:
+                return
+            await self.route(*request, writer)
+        except PayloadTooLarge:
+            with contextlib.suppress(ConnectionError):
+                await send_json(writer, 413, {"error": f"request body exceeds {MAX_BODY} bytes"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def route(self, method, target, headers, body, writer):
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        parts = [part for part in url.path.split("/") if part]
+        if parts == ["jobs"]:
+            if method != "POST":
+                return await send_json(writer, 405, {"error": "use POST"})
+            try:
+                request = validate_job(json.loads(body or b"{}"))
+            except ValueError as error:
+                return await send_json(writer, 400, {"error": str(error)})
+            job = self.submit(request)
+            if job is None:
+                return await send_json(writer, 503, {"error": "queue is full"}, {"Retry-After": "1"})
+            if query.get("stream") == ["1"]:
+                return await self.stream(job, headers, writer, cancel_on_disconnect=True)
+            return await send_json(writer, 202, job.summary())
+        if len(parts) >= 2 and parts[0] == "jobs" and parts[1].isdigit():
+            job = self.jobs.get(int(parts[1]))
+            if job is None:
+                return await send_json(writer, 404, {"error": "no such job"})
+            if len(parts) == 2 and method == "GET":
+                return await send_json(writer, 200, job.summary())
+            if len(parts) == 2 and method == "DELETE":
+                if await self.cancel(job):
+                    return await send_json(writer, 202, job.summary())
+                return await send_json(writer, 409, {"error": "job already finished"})
+            if parts[2:] == ["events"] and method == "GET":
+                return await self.stream(job, headers, writer)
+        return await send_json(writer, 404, {"error": "not found"})
+
+    async def stream(self, job, headers, writer, cancel_on_disconnect=False):
+        """
+        以分块传输流式返回任务事件。
+
+        Args:
+        - job (Job): 任务
+        - headers (dict): 请求头
+        - writer (asyncio.StreamWriter): 写端
+        - cancel_on_disconnect (bool): 客户端断开时是否取消任务
+
+        Returns:
+        - None
+        """
+        sse = "text/event-stream" in headers.get("accept", "")
+        content_type = "text/event-stream" if sse else "application/x-ndjson"
+        writer.write(f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\nTransfer-Encoding: chunked\r\n"
+                     f"Cache-Control: no-cache\r\nConnection: close\r\n\r\n".encode())
+        try:
+            async for kind, data in job.subscribe():
+                if sse:
+                    text = f"event: {kind}\ndata: {json.dumps(data)}\n\n"
+                else:
+                    text = json.dumps({"event": kind, "data": data}) + "\n"
+                chunk = text.encode()
+                writer.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                await writer.drain()  # 客户端读得慢时在此等待，事件缓冲区会跳过旧的进度
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        except ConnectionError:
+            if cancel_on_disconnect:
+                await self.cancel(job)
+
+
+async def read_request(reader):
+    """
+    读取一个 HTTP 请求。
+
+    Input:
+    - reader (asyncio.StreamReader): 读端
+
+    Output:
+    - tuple or None: (方法, 路径, 请求头, 请求体)
+
+    Raises:
+    - PayloadTooLarge: 请求体超过 MAX_BODY，此时请求体尚未读取
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    method, target, _ = line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY:
+        raise PayloadTooLarge()
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, headers, body
+
+
+async def send_json(writer, status, data, extra_headers=None):
+    """
+    发送一个 JSON 响应。
+
+    Input:
+    - writer (asyncio.StreamWriter): 写端
+    - status (int): 状态码
+    - data: 响应数据
+    - extra_headers (dict): 额外的响应头
+
+    Output:
+    - None
+    """
+    body = json.dumps(data).encode()
+    head = f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: application/json\r\n" \
+           f"Content-Length: {len(body)}\r\nConnection: close\r\n"
+    for name, value in (extra_headers or {}).items():
+        head += f"{name}: {value}\r\n"
+    writer.write(head.encode() + b"\r\n" + body)
+    await writer.drain()
+
+
+async def serve(host, port, unix_socket, num_workers, max_pending, max_finished=256):
+    """
+    启动服务并一直运行。
+
+    Input:
+    - host (str): 监听地址
+    - port (int): 监听端口
+    - unix_socket (str): Unix socket 路径，给出时忽略 host 与 port
+    - num_workers (int): 工作进程数量
+    - max_pending (int): 排队任务上限
+    - max_finished (int): 保留的已结束任务数上限
+
+    Output:
+    - None
+    """
+    server = SimulationServer(num_workers, max_pending, max_finished=max_finished)
+    await server.start()
+    if unix_socket:
+        listener = await asyncio.start_unix_server(server.handle_connection, path=unix_socket)
+    else:
+        listener = await asyncio.start_server(server.handle_connection, host, port)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地异步模拟服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("--unix", help="改为监听该 Unix socket 路径")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="工作进程数量")
+    parser.add_argument("--max-pending", type=int, default=64, help="排队任务上限")
+    parser.add_argument("--max-finished", type=int, default=256, help="保留的已结束任务数上限")
+    args = parser.parse_args()
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(serve(args.host, args.port, args.unix, args.workers, args.max_pending, args.max_finished))
@@ -0,0 +1,186 @@
+# sim_watchdog.py
+"""
+模拟运行的检查：
+- Watchdog：连续若干周期没有指令提交时，输出诊断快照并终止模拟，避免卡死的状态无限循环
+- InvariantChecker：每个周期检查 ROB、保留站与寄存器标签的一致性，仅在调试模式下挂载，关闭时没有任何开销
+"""
+
+
+class SimulationStalled(Exception):
+    """连续若干周期没有指令提交，模拟被终止。"""
+
+    def __init__(self, message, snapshot):
+        super().__init__(f"{message}\n{snapshot}")
+        self.snapshot = snapshot
+
+
+class InvariantViolation(Exception):
+    """ROB、保留站或寄存器标签的状态不一致。"""
+
+
+def in_flight(rob):
+    """
+    按从旧到新的顺序返回 ROB 中尚未提交的条目。
+
+    Input:
+    - rob (ReorderBuffer): ROB
+
+    Output:
+    - list: ROB条目列表
+    """
+    entries = []
+    index = rob.head
+    while index != rob.tail:
+        entries.append(rob.entries[index])
+        index = (index + 1) % rob.size
+    return entries
+
+
+def check_invariants(cpu):
+    """
+    检查 ROB、保留站与寄存器标签的一致性。
+
+    Input:
+    - cpu (CPU): 模拟器对象
+
+    Output:
+    - list: 违反的不变式描述，一致时为空列表
+    """
+    rob = cpu.reorder_buffer
+    problems = []
+    if not (0 <= rob.head < rob.size and 0 <= rob.tail < rob.size):
+        return [f"ROB head {rob.head} / tail {rob.tail} out of range 0-{rob.size - 1}"]
+    entries = in_flight(rob)
+    if None in entries:
+        return ["ROB window contains an empty slot"]
+    labels = [entry.rob_index for entry in entries]
+    expected = list(range(rob.rob_index_counter - len(entries) + 1, rob.rob_index_counter + 1))
+    if labels != expected:
+        problems.append(f"ROB labels {labels} are not the last issued labels {expected}")
+    if rob.committed + len(entries) != rob.rob_index_counter:
+        problems.append(f"{rob.committed} committed + {len(entries)} in flight != "
+                        f"{rob.rob_index_counter} issued")
+    by_label = {entry.rob_index: entry for entry in entries}
+    for entry in entries:
+        if not entry.busy or entry.state not in {"Issue", "Exec", "Write result"}:
+            problems.append(f"ROB #{entry.rob_index} in flight with busy={entry.busy} state={entry.state}")
+
+    def pending(tag):  # 等待中的标签必须指向尚未写回结果的在途条目
+        entry = by_label.get(tag)
+        return entry is not None and entry.state != "Write result" and entry.instruction.opcode != "SD"
+
+    owners = set()
+    for rs in cpu.all_stations():
+        if not rs.busy:
+            continue
+        entry = by_label.get(rs.rob_index)
+        if entry is None or entry.instruction.opcode != rs.op:
+            problems.append(f"{rs.name} holds #{rs.rob_index} ({rs.op}) which is not an in-flight {rs.op}")
+        if rs.rob_index in owners:
+            problems.append(f"{rs.name}: #{rs.rob_index} is held by more than one station")
+        owners.add(rs.rob_index)
+        for name, tag in (("qj", rs.qj), ("qk", rs.qk)):
+            if tag and not pending(tag):
+                problems.append(f"{rs.name} #{rs.rob_index} waits on {name}=#{tag}, which will never broadcast")
+    for entry in entries:
+        tag = entry.sd_data["qj"] if entry.instruction.opcode == "SD" else None
+        if tag and not pending(tag):
+            problems.append(f"SD #{entry.rob_index} waits on #{tag}, which will never broadcast")
+    for i, reg in enumerate(cpu.register_group.registers):
+        if not reg.busy:
+            continue
+        entry = by_label.get(reg.rob_label)
+        if entry is None or entry.instruction.opcode == "SD" or int(entry.instruction.destination[1:]) != i:
+            problems.append(f"register {i} is tagged #{reg.rob_label}, which is not an in-flight write to it")
+    return problems
+
+
+def describe_head(cpu):
+    """
+    说明 ROB 头部条目（或无法发射的队首指令）在等待什么。
+
+    Input:
+    - cpu (CPU): 模拟器对象
+
+    Output:
+    - str: 说明
+    """
+    entries = in_flight(cpu.reorder_buffer)
+    if not entries:
+        if cpu.instruction_queue:
+            ins = cpu.instruction_queue[0]
+            return f"ROB is empty and {ins.opcode} {ins.destination} {ins.src1} {ins.src2} cannot issue"
+        return "ROB and instruction queue are empty"
+    entry = entries[0]
+    ins = entry.instruction
+    text = f"ROB head #{entry.rob_index} {ins.opcode} {ins.destination} {ins.src1} {ins.src2} is in state {entry.state}"
+    if ins.opcode == "SD":
+        if entry.sd_data["qj"]:
+            return f"{text}, waiting for #{entry.sd_data['qj']}"
+        if not entry.sd_data["vj"]:
+            return f"{text}, its data operand {ins.destination} is never considered ready"
+        return text
+    for rs in cpu.all_stations():
+        if rs.busy and rs.rob_index == entry.rob_index:
+            if rs.op == "LD" and rs.remain_time == 2 and not rs.vj and not rs.qj:
+                return f"{text} in {rs.name}, its base register {ins.src2} is never considered ready"
+            return f"{text} in {rs.name} (qj={rs.qj}, qk={rs.qk}, remain={rs.remain_time})"
+    return f"{text}, not held by any station"
+
+
+def snapshot(cpu):
+    """
+    生成诊断快照：头部条目说明、不变式检查结果、总线与各组件状态。
+
+    Input:
+    - cpu (CPU): 模拟器对象
+
+    Output:
+    - str: 快照文本
+    """
+    lines = [describe_head(cpu)]
+    lines += [f"invariant: {problem}" for problem in check_invariants(cpu)]
+    lines.append(f"CDB: label={cpu.bus.label!r} value={cpu.bus.value!r}; "
+                 f"ROB bus: register={cpu.rob_bus.label!r} label={cpu.rob_bus.value!r}")
+    lines.append(f"instructions left in queue: {len(cpu.instruction_queue)}")
+    return "\n".join(lines) + "\n" + cpu.record_component_state()
+
+
+class Watchdog:
+    def __init__(self, max_cycles):
+        """
+        CPU观察者：连续 max_cycles 个周期没有指令提交时抛出 SimulationStalled。
+
+        Args:
+        - max_cycles (int): 允许的最长无提交周期数
+        """
+        self.max_cycles = max_cycles
+        self.committed = 0
+        self.last_commit = 0  # 最近一次有指令提交的周期
+
+    def on_cycle(self, cpu):
+        committed = cpu.reorder_buffer.committed
+        if committed != self.committed:
+            self.committed = committed
+            self.last_commit = cpu.clock_cycles
+        elif cpu.clock_cycles - self.last_commit > self.max_cycles:
+            raise SimulationStalled(f"No instruction committed in {self.max_cycles} cycles "
+                                    f"(cycle {cpu.clock_cycles}, {committed} committed).", snapshot(cpu))
+
+    def on_finish(self, cpu):
+        pass
+
+
+class InvariantChecker:
+    def __init__(self):
+        """
+        CPU观察者：每个周期检查一致性，发现问题时抛出 InvariantViolation。
+        """
+
+    def on_cycle(self, cpu):
+        problems = check_invariants(cpu)
+        if problems:
+            raise InvariantViolation(f"cycle {cpu.clock_cycles}: " + "; ".join(problems))
+
+    def on_finish(self, cpu):
+        pass
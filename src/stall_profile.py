@@ -0,0 +1,179 @@
+# stall_profile.py
+"""
+按静态指令（指令文件中的行）统计周期去向，输出类似 perf annotate 的注释清单。
+
+每条动态指令从到达指令队列队首起，每个周期被归入以下一类，再按所属的指令文件行累加：
+- issue：发射周期
+- rob_slot：位于队首但 ROB 已满，无法发射
+- rs_slot：位于队首但对应的保留站 / Load Buffer 已满，无法发射
+- operands：已发射，在保留站中等待操作数（qj/qk，LD 的基址寄存器，SD 的数据）
+- execute：正在执行（含把结果写上总线的最后一个执行周期）
+- cdb：因总线被占用而等待写总线，以及结果在总线上广播、写回 ROB 的周期
+- commit：结果已写回 ROB，等待到达 ROB 头部提交（含提交周期）
+"""
+import argparse
+import contextlib
+import os
+
+from main import CPU, ADD_EXECUTION_CYCLES, MULT_EXECUTION_CYCLES, load_instructions
+
+LATENCIES = {**ADD_EXECUTION_CYCLES, **MULT_EXECUTION_CYCLES}
+CATEGORIES = ("issue", "rob_slot", "rs_slot", "operands", "execute", "cdb", "commit")
+HEADERS = ("Issue", "ROB", "RS", "Oper", "Exec", "CDB", "Commit")
+
+
+def instruction_key(instruction):
+    """
+    返回动态指令所属的静态指令：指令文件中的行号，没有行号时为指令文本。
+    """
+    if instruction.line is not None:
+        return instruction.line
+    return f"{instruction.opcode} {instruction.destination} {instruction.src1} {instruction.src2}"
+
+
+class StallProfiler:
+    def __init__(self):
+        """
+        CPU观察者：每个周期结束时为每条动态指令归类本周期，按静态指令累加。
+        """
+        self.cycles = {}  # 静态指令 -> 各类周期数
+        self.instances = {}  # 静态指令 -> 动态实例数
+        self.issued = 0  # 已发射的指令数
+        self.rob_full = False  # 上一周期结束时 ROB 是否已满，决定本周期队首指令为何无法发射
+        self.previous_remain = {}  # ROB编号 -> 上一周期结束时保留站的剩余执行周期
+
+    def add(self, instruction, category):
+        key = instruction_key(instruction)
+        if key not in self.cycles:
+            self.cycles[key] = [0] * len(CATEGORIES)
+            self.instances[key] = 0
+        self.cycles[key][CATEGORIES.index(category)] += 1
+
+    def classify_station(self, rs, latency):
+        """
+        根据保留站状态为已发射的指令归类。
+
+        Args:
+        - rs (ReservationStation): 指令所在的保留站或 Load Buffer
+        - latency (int or None): 浮点指令的执行周期，Load Buffer 为 None
+
+        Returns:
+        - str: 周期类别
+        """
+        if latency is None:  # Load Buffer：2 等待基址，1 计算地址，0 访存并写总线
+            return "operands" if rs.remain_time == 2 else "execute"
+        if rs.qj or rs.qk or rs.remain_time == latency:  # 本周期刚取得操作数时下个周期才开始执行
+            return "operands"
+        if rs.remain_time == 1 and self.previous_remain.get(rs.rob_index) == 1:  # 写总线失败，重试
+            return "cdb"
+        return "execute"
+
+    def on_cycle(self, cpu):
+        rob = cpu.reorder_buffer
+        counter = rob.rob_index_counter
+        if counter == self.issued and cpu.instruction_queue:
+            self.add(cpu.instruction_queue[0], "rob_slot" if self.rob_full else "rs_slot")
+
+        stations = {}  # ROB编号 -> (保留站, 执行周期)
+        for rs in cpu.all_stations():
+            if rs.busy:
+                stations[rs.rob_index] = (rs, None if rs.op == "LD" else LATENCIES.get(rs.op, 1))
+
+        index = rob.head
+        while index != rob.tail:
+            entry = rob.entries[index]
+            index = (index + 1) % rob.size
+            instruction = entry.instruction
+            if entry.rob_index > self.issued:  # 本周期发射
+                self.add(instruction, "issue")
+                self.instances[instruction_key(instruction)] += 1
+            elif instruction.opcode == "SD":
+                if entry.state == "Exec" and (entry.sd_data["qj"] or not entry.sd_data["vj"]):
+                    self.add(instruction, "operands")
+                else:
+                    self.add(instruction, "execute" if entry.state == "Issue" else "commit")
+            elif entry.rob_index in stations:
+                self.add(instruction, self.classify_station(*stations[entry.rob_index]))
+            elif entry.state == "Write result" and entry.state_cycle[-1] == cpu.clock_cycles:  # 本周期广播
+                self.add(instruction, "cdb")
+            else:
+                self.add(instruction, "commit")
+
+        for entry in rob.commits:  # 本周期提交
+            self.add(entry.instruction, "commit")
+        self.issued = counter
+        self.rob_full = (rob.tail + 1) % rob.size == rob.head
+        self.previous_remain = {rob_index: rs.remain_time for rob_index, (rs, _) in stations.items()}
+
+    def on_finish(self, cpu):
+        pass
+
+    def ranked(self):
+        """
+        按总周期数从高到低排列静态指令。
+
+        Returns:
+        - list: [(静态指令, 总周期数, 各类周期数)]
+        """
+        rows = [(key, sum(counts), counts) for key, counts in self.cycles.items()]
+        return sorted(rows, key=lambda row: -row[1])
+
+    def report(self, source=None, top=10):
+        """
+        生成注释清单与热点排名。
+
+        Args:
+        - source (list): 指令文件的各行，给出时按文件顺序输出每一行；否则只输出有统计的静态指令
+        - top (int): 热点排名输出的行数
+
+        Returns:
+        - str: 报告文本
+        """
+        total = sum(sum(counts) for counts in self.cycles.values()) or 1
+        header = f"{'Percent':>8} {'Count':>8} " + " ".join(f"{h:>8}" for h in HEADERS) + " : Line  Source"
+        lines = [header, "-" * len(header)]
+
+        def row(key, text):
+            counts = self.cycles.get(key)
+            if counts is None:
+                return f"{'':8} {'':8} " + " ".join(f"{'':8}" for _ in HEADERS) + f" : {text}"
+            return (f"{sum(counts) / total:8.2%} {self.instances[key]:8} " +
+                    " ".join(f"{count:8}" for count in counts) + f" : {text}")
+
+        if source is not None:
+            for number, text in enumerate(source, start=1):
+                if text.strip():
+                    lines.append(row(number, f"{number:4}  {text.rstrip()}"))
+        else:
+            for key in self.cycles:
+                lines.append(row(key, f"{key:4}" if isinstance(key, int) else key))
+
+        lines += ["", f"Hot lines (top {top}):"]
+        for rank, (key, cycles, counts) in enumerate(self.ranked()[:top], start=1):
+            text = source[key - 1].strip() if source is not None and isinstance(key, int) else key
+            dominant = max(range(len(CATEGORIES)), key=lambda i: counts[i])
+            lines.append(f"{rank:3}. {cycles / total:7.2%}  line {key}: {text}  "
+                         f"(mostly {CATEGORIES[dominant]}, {counts[dominant] / cycles:.0%})")
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按指令文件行统计停顿原因")
+    parser.add_argument("input", help="指令文件")
+    parser.add_argument("--rob", type=int, default=6, help="ROB 条目数")
+    parser.add_argument("--load-buffers", type=int, default=2, help="Load Buffer 数量")
+    parser.add_argument("--add", type=int, default=3, help="Add 保留站数量")
+    parser.add_argument("--mult", type=int, default=2, help="Mult 保留站数量")
+    parser.add_argument("--compiled", action="store_true", help="使用编译模式")
+    parser.add_argument("--top", type=int, default=10, help="热点排名输出的行数")
+    args = parser.parse_args()
+
+    profiler = StallProfiler()
+    cpu = CPU(num_registers=11, memory_size=1024, num_load_buffers=args.load_buffers, num_rob_entries=args.rob,
+              instruction_queue=load_instructions(args.input, lazy=True), observers=[profiler],
+              num_add_stations=args.add, num_mult_stations=args.mult, compiled=args.compiled)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        cpu.run_simulation(None)
+    with open(args.input) as file:
+        print(profiler.report(file.readlines(), args.top))
+    print(f"\n{cpu.clock_cycles} cycles, {cpu.reorder_buffer.committed} instructions")
@@ -0,0 +1,326 @@
+# state_hash.py
+"""
+逐周期状态哈希：每个周期把机器状态折叠进一条链式哈希，只保存每个周期的链值（8字节）。
+
+由于第 n 个周期的链值依赖前 n 个周期的全部状态，两次运行的链值从第一个不同的周期开始
+之后全部不同，因此可以二分查找第一个分歧周期，而不需要保存完整的状态输出。
+
+两种哈希内容：
+- text：CPU.record_component_state 的输出文本，可与 output/*.txt 中的周期状态直接比较
+- timing：与数据值无关的规范化时序状态（ROB 条目、保留站、寄存器标签、总线），
+  对象模型 CPU 与批量引擎 BatchCPU 产生相同的哈希，可用于跨引擎对拍
+"""
+import argparse
+import contextlib
+import hashlib
+import os
+import re
+
+from main import CPU, load_instructions
+
+MAGIC = b"TOMHASH1"
+DIGEST_SIZE = 8
+MODES = ("text", "timing")
+
+
+def chain(previous, data):
+    """
+    计算链式哈希的下一个值。
+
+    Input:
+    - previous (bytes): 上一周期的链值
+    - data (bytes): 本周期状态
+
+    Output:
+    - bytes: 本周期的链值
+    """
+    return hashlib.blake2b(previous + data, digest_size=DIGEST_SIZE).digest()
+
+
+def cpu_timing_state(cpu):
+    """
+    提取对象模型 CPU 的规范化时序状态。
+
+    Input:
+    - cpu (CPU): 模拟器对象
+
+    Output:
+    - tuple: 已发射指令数、ROB、保留站、寄存器与总线状态
+    """
+    rob = cpu.reorder_buffer
+    entries = []
+    index = rob.head
+    while index != rob.tail:
+        entry = rob.entries[index]
+        if entry.instruction.opcode == "SD":
+            entries.append((entry.rob_index, entry.state, entry.sd_data["qj"] or 0, bool(entry.sd_data["vj"])))
+        else:
+            entries.append((entry.rob_index, entry.state, 0, False))
+        index = (index + 1) % rob.size
+    stations = []
+    for rs in cpu.all_stations():
+        if not rs.busy:
+            stations.append((0,))
+        elif rs.op == "LD":
+            stations.append((1, rs.rob_index, rs.qj or 0, rs.qk or 0, rs.remain_time, bool(rs.vj)))
+        else:
+            stations.append((1, rs.rob_index, rs.qj or 0, rs.qk or 0, rs.remain_time))
+    registers = tuple((reg.busy, reg.rob_label or 0) for reg in cpu.register_group.registers)
+    issued = rob.rob_index_counter
+    return issued, tuple(entries), tuple(stations), registers, cpu.bus.label or 0, cpu.rob_bus.value or 0
+
+
+def batch_timing_state(batch, b):
+    """
+    提取批量引擎中第 b 个配置的规范化时序状态，与 cpu_timing_state 的结果可直接比较。
+
+    Input:
+    - batch (BatchCPU): 批量引擎
+    - b (int): 配置下标
+
+    Output:
+    - tuple: 与 cpu_timing_state 相同结构的状态
+    """
+    from batch_engine import OP_SD, ISSUE, EXEC, WRITE, COMMIT
+
+    names = {ISSUE: "Issue", EXEC: "Exec", WRITE: "Write result", COMMIT: "Commit"}
+    entries = []
+    for seq in range(int(batch.head[b]), int(batch.pc[b])):
+        slot = seq % batch.ring
+        state = names[int(batch.rob_state[b, slot])]
+        if batch.trace.op[seq] == OP_SD:
+            entries.append((seq + 1, state, int(batch.sd_qj[b, slot]), bool(batch.sd_vj_ok[b, slot])))
+        else:
+            entries.append((seq + 1, state, 0, False))
+    stations = []
+    for unit in (batch.load, batch.add, batch.mult):
+        for s in range(int(unit.exists[b].sum())):
+            if not unit.busy[b, s]:
+                stations.append((0,))
+                continue
+            fields = (1, int(unit.rob[b, s]), int(unit.qj[b, s]), int(unit.qk[b, s]), int(unit.remain_time[b, s]))
+            stations.append(fields + (bool(unit.vj_ok[b, s]),) if unit is batch.load else fields)
+    registers = tuple((bool(busy), int(label)) for busy, label in zip(batch.reg_busy[b], batch.reg_label[b]))
+    return (int(batch.pc[b]), tuple(entries), tuple(stations), registers, int(batch.bus_label[b]),
+            int(batch.rob_bus_value[b]))
+
+
+class HashWriter:
+    def __init__(self, path, mode):
+        """
+        把每个周期的链值写入文件。
+
+        Args:
+        - path (str): 输出文件路径
+        - mode (str): 哈希内容，text 或 timing
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode: {mode}")
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC + mode.encode().ljust(8))
+        self.digest = b""
+        self.closed = False
+
+    def append(self, data):
+        """
+        折叠一个周期的状态并写出链值。
+
+        Args:
+        - data (bytes): 本周期状态
+
+        Returns:
+        - None
+        """
+        self.digest = chain(self.digest, data)
+        self.file.write(self.digest)
+
+    def close(self):
+        if not self.closed:
+            self.file.close()
+            self.closed = True
+
+
+class StateHasher:
+    def __init__(self, path, mode="text"):
+        """
+        CPU观察者：每个周期结束时对状态做链式哈希并写入文件。
+
+        Args:
+        - path (str): 输出文件路径
+        - mode (str): 哈希内容，text 或 timing
+        """
+        self.mode = mode
+        self.writer = HashWriter(path, mode)
+
+    def on_cycle(self, cpu):
+        if self.mode == "text":
+            self.writer.append(cpu.record_component_state().encode())
+        else:
+            self.writer.append(repr(cpu_timing_state(cpu)).encode())
+
+    def on_finish(self, cpu):
+        self.writer.close()
+
+
+def hash_batch(batch, paths):
+    """
+    运行批量引擎，并为各配置分别写出 timing 哈希文件。
+
+    Input:
+    - batch (BatchCPU): 尚未运行的批量引擎
+    - paths (list): 各配置的输出文件路径，与配置一一对应
+
+    Output:
+    - ndarray: 每个配置的总周期数
+    """
+    writers = [HashWriter(path, "timing") for path in paths]
+    try:
+        while batch.active.any():
+            running = batch.rows[batch.active]
+            batch.step()
+            for b in running:
+                writers[b].append(repr(batch_timing_state(batch, b)).encode())
+    finally:
+        for writer in writers:
+            writer.close()
+    return batch.cycles
+
+
+def hash_dump(dump_file, path):
+    """
+    从 run_simulation 输出的文本文件中还原每个周期的状态，写出 text 哈希文件。
+
+    Input:
+    - dump_file (str): 周期状态输出文件，如 output/output1.txt
+    - path (str): 输出的哈希文件路径
+
+    Output:
+    - int: 周期数
+    """
+    writer = HashWriter(path, "text")
+    header = re.compile(r"^cycle_(\d+)(?:-(\d+))?;$")
+    cycles = 0
+    with open(dump_file) as file:
+        span = None
+        state = []
+        for line in file:
+            match = header.match(line.strip())
+            if match:
+                span = (int(match.group(1)), int(match.group(2) or match.group(1)))
+                state = []
+            elif span:
+                state.append(line)
+                if line.startswith("------"):  # 一个周期状态结束，按区间展开
+                    text = "".join(state).encode()
+                    for _ in range(span[0], span[1] + 1):
+                        writer.append(text)
+                    cycles = span[1]
+                    span = None
+    writer.close()
+    return cycles
+
+
+class HashStream:
+    def __init__(self, path):
+        """
+        以随机访问方式读取哈希文件。
+
+        Args:
+        - path (str): 哈希文件路径
+        """
+        self.file = open(path, 'rb')
+        header = self.file.read(len(MAGIC) + 8)
+        if not header.startswith(MAGIC):
+            raise ValueError(f"{path} is not a state hash file.")
+        self.mode = header[len(MAGIC):].decode().strip()
+        self.offset = len(header)
+        self.cycles = (os.path.getsize(path) - self.offset) // DIGEST_SIZE
+
+    def __len__(self):
+        return self.cycles
+
+    def __getitem__(self, cycle):
+        """
+        返回某个周期（从1开始）的链值。
+        """
+        self.file.seek(self.offset + (cycle - 1) * DIGEST_SIZE)
+        return self.file.read(DIGEST_SIZE)
+
+    def close(self):
+        self.file.close()
+
+
+def first_divergence(a, b):
+    """
+    二分查找两条哈希流中第一个不同的周期。
+
+    Input:
+    - a, b (HashStream): 两条哈希流
+
+    Output:
+    - int or None: 第一个分歧周期，完全相同时返回 None；一条是另一条的前缀时返回较短者长度+1
+    """
+    common = min(len(a), len(b))
+    low, high = 1, common + 1  # 在 [low, high) 中查找第一个不同的周期
+    while low < high:
+        mid = (low + high) // 2
+        if a[mid] == b[mid]:
+            low = mid + 1
+        else:
+            high = mid
+    if low <= common:
+        return low
+    return None if len(a) == len(b) else common + 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="逐周期状态哈希与分歧定位")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="运行模拟并记录哈希")
+    record.add_argument("input", help="指令文件")
+    record.add_argument("hash", help="输出的哈希文件")
+    record.add_argument("--mode", choices=MODES, default="text", help="哈希内容")
+    record.add_argument("--compiled", action="store_true", help="使用编译模式")
+    record.add_argument("--rob", type=int, default=6, help="ROB 条目数")
+    record.add_argument("--load-buffers", type=int, default=2, help="Load Buffer 数量")
+    record.add_argument("--batch", action="store_true", help="用批量引擎运行（仅 timing 模式）")
+    dump = commands.add_parser("dump", help="从周期状态输出文件生成 text 哈希")
+    dump.add_argument("output", help="周期状态输出文件")
+    dump.add_argument("hash", help="输出的哈希文件")
+    compare = commands.add_parser("compare", help="比较两个哈希文件")
+    compare.add_argument("a", help="哈希文件")
+    compare.add_argument("b", help="哈希文件")
+    args = parser.parse_args()
+    if args.command == "record" and args.batch and args.mode != "timing":
+        parser.error("--batch only supports --mode timing")
+
+    if args.command == "record":
+        instructions = load_instructions(args.input, lazy=not args.batch)
+        if args.batch:
+            from batch_engine import BatchCPU
+
+            batch = BatchCPU([{"num_rob_entries": args.rob, "num_load_buffers": args.load_buffers}], instructions)
+            cycles = hash_batch(batch, [args.hash])[0]
+        else:
+            hasher = StateHasher(args.hash, args.mode)
+            cpu = CPU(num_registers=11, memory_size=1024, num_load_buffers=args.load_buffers,
+                      num_rob_entries=args.rob, instruction_queue=instructions, observers=[hasher],
+                      compiled=args.compiled)
+            try:
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    cpu.run_simulation(None)
+            finally:
+                hasher.writer.close()
+            cycles = cpu.clock_cycles
+        print(f"{cycles} cycles hashed to {args.hash}")
+    elif args.command == "dump":
+        print(f"{hash_dump(args.output, args.hash)} cycles hashed to {args.hash}")
+    else:
+        a, b = HashStream(args.a), HashStream(args.b)
+        if a.mode != b.mode:
+            parser.error(f"cannot compare {a.mode} hashes with {b.mode} hashes")
+        cycle = first_divergence(a, b)
+        if cycle is None:
+            print(f"identical ({len(a)} cycles)")
+        else:
+            print(f"first divergence at cycle {cycle} ({len(a)} vs {len(b)} cycles)")
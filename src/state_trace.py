@@ -0,0 +1,212 @@
+# state_trace.py
+"""
+可随机访问的逐周期状态记录文件。
+
+文件由若干独立压缩的块组成，每块覆盖连续的 keyframe_interval 个周期：
+块内第一个周期保存完整状态（关键帧），之后每个周期只保存相对上一周期变化的行（ROB 条目、
+保留站、寄存器标签各占一行，与 CPU.record_component_state 的输出一致）。
+文件末尾保存 周期 -> 块偏移 的索引，读取任意周期时二分查找所在的块，只解压这一块。
+
+文件布局：
+    MAGIC | 块1 | 块2 | ... | 索引(JSON) | 索引偏移(8字节小端) | END_MAGIC
+"""
+import argparse
+import bisect
+import contextlib
+import json
+import os
+import struct
+import zlib
+
+from main import CPU, load_instructions
+
+MAGIC = b"TOMSTATE1\n"
+END_MAGIC = b"TOMEND"
+TAIL = struct.Struct("<Q")
+
+
+class StateTraceWriter:
+    def __init__(self, path, keyframe_interval=1024, level=6):
+        """
+        CPU观察者：每个周期记录一次组件状态并按块压缩写入文件。
+
+        Args:
+        - path (str): 输出文件路径
+        - keyframe_interval (int): 每块包含的周期数，即关键帧间隔
+        - level (int): zlib 压缩级别
+        """
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+        self.keyframe_interval = keyframe_interval
+        self.level = level
+        self.index = []  # [块的第一个周期, 偏移, 长度]
+        self.block = []  # 当前块中尚未写出的记录
+        self.block_start = None
+        self.previous = None
+        self.cycles = 0
+        self.closed = False
+
+    def on_cycle(self, cpu):
+        lines = cpu.record_component_state().splitlines()
+        cycle = cpu.clock_cycles
+        if self.block_start is None:
+            self.block_start = cycle
+            self.block.append(lines)  # 关键帧
+        else:
+            self.block.append([[i, line] for i, line in enumerate(lines) if line != self.previous[i]])
+        self.previous = lines
+        self.cycles = cycle
+        if len(self.block) >= self.keyframe_interval:
+            self.flush()
+
+    def on_finish(self, cpu):
+        self.close()
+
+    def flush(self):
+        """
+        压缩并写出当前块。
+
+        Returns:
+        - None
+        """
+        if not self.block:
+            return
+        data = zlib.compress("\n".join(json.dumps(r, separators=(",", ":")) for r in self.block).encode(),
+                             self.level)
+        self.index.append([self.block_start, self.file.tell(), len(data)])
+        self.file.write(data)
+        self.block = []
+        self.block_start = None
+
+    def close(self):
+        """
+        写出剩余的块与索引并关闭文件，可重复调用。
+
+        Returns:
+        - None
+        """
+        if self.closed:
+            return
+        self.flush()
+        offset = self.file.tell()
+        self.file.write(json.dumps({"cycles": self.cycles, "keyframe_interval": self.keyframe_interval,
+                                    "index": self.index}).encode())
+        self.file.write(TAIL.pack(offset) + END_MAGIC)
+        self.file.close()
+        self.closed = True
+
+
+class StateTraceReader:
+    def __init__(self, path):
+        """
+        读取状态记录文件，按周期随机访问完整状态。
+
+        Args:
+        - path (str): 状态记录文件路径
+        """
+        self.file = open(path, 'rb')
+        if self.file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a state trace file.")
+        self.file.seek(-(TAIL.size + len(END_MAGIC)), os.SEEK_END)
+        tail = self.file.read()
+        if not tail.endswith(END_MAGIC):
+            raise ValueError(f"{path} is truncated (missing index).")
+        offset = TAIL.unpack(tail[:TAIL.size])[0]
+        end = self.file.seek(-(TAIL.size + len(END_MAGIC)), os.SEEK_END)
+        self.file.seek(offset)
+        footer = json.loads(self.file.read(end - offset))
+        self.cycles = footer["cycles"]
+        self.keyframe_interval = footer["keyframe_interval"]
+        self.index = footer["index"]
+        self.starts = [entry[0] for entry in self.index]
+        self.cached = None  # (块序号, 解码后的记录)
+
+    def load_block(self, number):
+        """
+        读取并解压一个块，保留最近一次的结果。
+
+        Args:
+        - number (int): 块序号
+
+        Returns:
+        - list: 块中的记录
+        """
+        if self.cached and self.cached[0] == number:
+            return self.cached[1]
+        _, offset, length = self.index[number]
+        self.file.seek(offset)
+        records = [json.loads(line) for line in zlib.decompress(self.file.read(length)).decode().split("\n")]
+        self.cached = (number, records)
+        return records
+
+    def lines(self, cycle):
+        """
+        返回某个周期结束时的完整状态行。
+
+        Args:
+        - cycle (int): 周期，从1开始
+
+        Returns:
+        - list: 状态行
+        """
+        if not 1 <= cycle <= self.cycles:
+            raise IndexError(f"cycle {cycle} out of range 1-{self.cycles}")
+        number = bisect.bisect_right(self.starts, cycle) - 1
+        records = self.load_block(number)
+        lines = list(records[0])
+        for delta in records[1:cycle - self.starts[number] + 1]:
+            for i, line in delta:
+                lines[i] = line
+        return lines
+
+    def state(self, cycle):
+        """
+        返回某个周期结束时的状态文本，与 CPU.record_component_state 的输出相同。
+
+        Args:
+        - cycle (int): 周期，从1开始
+
+        Returns:
+        - str: 状态文本
+        """
+        return "\n".join(self.lines(cycle)) + "\n"
+
+    def close(self):
+        self.file.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="记录或查询可随机访问的逐周期状态文件")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="运行模拟并记录状态")
+    record.add_argument("input", help="指令文件")
+    record.add_argument("trace", help="输出的状态记录文件")
+    record.add_argument("--rob", type=int, default=6, help="ROB 条目数")
+    record.add_argument("--load-buffers", type=int, default=2, help="Load Buffer 数量")
+    record.add_argument("--keyframe-interval", type=int, default=1024, help="关键帧间隔（周期）")
+    show = commands.add_parser("show", help="输出某个周期的完整状态")
+    show.add_argument("trace", help="状态记录文件")
+    show.add_argument("cycle", type=int, nargs="+", help="周期")
+    info = commands.add_parser("info", help="输出文件概况")
+    info.add_argument("trace", help="状态记录文件")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        writer = StateTraceWriter(args.trace, keyframe_interval=args.keyframe_interval)
+        cpu = CPU(num_registers=11, memory_size=1024, num_load_buffers=args.load_buffers,
+                  num_rob_entries=args.rob, instruction_queue=load_instructions(args.input, lazy=True), observers=[writer])
+        try:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                cpu.run_simulation(None)
+        finally:
+            writer.close()
+        print(f"{cpu.clock_cycles} cycles written to {args.trace}")
+    elif args.command == "show":
+        reader = StateTraceReader(args.trace)
+        for cycle in args.cycle:
+            print(f"cycle_{cycle};")
+            print(reader.state(cycle), end="")
+    else:
+        reader = StateTraceReader(args.trace)
+        print(f"cycles: {reader.cycles}, blocks: {len(reader.index)}, "
+              f"keyframe interval: {reader.keyframe_interval}, size: {os.path.getsize(args.trace)} bytes")
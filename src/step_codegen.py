@@ -0,0 +1,554 @@
+# step_codegen.py
+"""
+为固定配置的CPU生成专用的单周期函数与状态记录函数。
+
+生成的单周期函数与 CPU.step 行为完全一致（发射 -> 各部件更新 -> 写回 -> 总线更新），但：
+- 保留站循环按已知数量展开，每个保留站直接绑定为局部名字
+- ROB大小、执行周期等配置常量直接写入代码
+- 指令类型只在发射时查一次表，不再逐部件按字符串分派
+生成的状态记录函数与 CPU.record_component_state 输出相同，但只重新格式化发生变化的部分。
+寄存器的读取与标签写入直接内联在单周期函数中；quiet 模式下不生成发射失败时的打印语句。
+"""
+from cpu_component import ReorderBufferEntry
+
+# 发射时的指令分类
+UNIT_ADD, UNIT_MULT, UNIT_LOAD, UNIT_SD = range(4)
+OPERATORS = {"ADDD": "+", "SUBD": "-", "MULTD": "*", "DIVD": "/"}
+
+
+def indent(lines, depth):
+    """
+    为代码行统一增加缩进。
+
+    Input:
+    - lines (list): 代码行
+    - depth (int): 缩进层数
+
+    Output:
+    - list: 缩进后的代码行
+    """
+    return ["    " * depth + line if line else line for line in lines]
+
+
+def gen_read(operand, value, tag):
+    """
+    生成内联的寄存器读取代码，对应 RegisterGroup.read：先查 ROB 总线旁路，再查寄存器标签。
+
+    Input:
+    - operand (str): 寄存器标识符的表达式
+    - value (str): 存放 vj/vk 的局部名字
+    - tag (str): 存放 qj/qk 的局部名字
+
+    Output:
+    - list: 代码行
+    """
+    return [
+        f"src = {operand}",
+        "if src == rob_bus.label:",
+        f"    {value} = f\"#{{rob_bus.value}}\"",
+        f"    {tag} = None",
+        "else:",
+        "    register, register_index = REGISTERS.get(src) or parse(src)",
+        "    if register is not None and register.busy:",
+        f"        {value} = None",
+        f"        {tag} = register.rob_label",
+        "    else:",
+        f"        {value} = register_index",
+        f"        {tag} = None",
+    ]
+
+
+def gen_write(operand, label):
+    """
+    生成内联的寄存器标签写入代码，对应 RegisterGroup.write。
+
+    Input:
+    - operand (str): 寄存器标识符的表达式
+    - label (str): 标签的表达式
+
+    Output:
+    - list: 代码行
+    """
+    return [
+        f"register = TARGETS.get({operand}) or regs[parse({operand})[1]]",
+        "register.busy = True",
+        f"register.rob_label = {label}",
+    ]
+
+
+def latency_expr(execution_cycles):
+    """
+    生成保留站执行周期的表达式：各操作周期相同时直接写为常量。
+
+    Input:
+    - execution_cycles (dict): 不同操作的执行周期
+
+    Output:
+    - str: 代码表达式
+    """
+    values = set(execution_cycles.values())
+    if len(values) == 1:
+        return repr(values.pop())
+    return f"{execution_cycles!r}.get(op, 1)"
+
+
+def gen_rob_issue():
+    """
+    生成在ROB尾部加入新条目的代码，对应 ReorderBuffer.issue_instruction 的成功分支。
+
+    Output:
+    - list: 代码行
+    """
+    return [
+        "rob.rob_index_counter += 1",
+        "rob_index = rob.rob_index_counter",
+        "entry = ReorderBufferEntry(rob_index, ins)",
+        "entries[tail] = entry",
+        "rob.tail = next_tail",
+        "entry.state = \"Issue\"",
+        "entry.issue_this_cycle = True",
+        "entry.state_cycle.append(clock)",
+    ]
+
+
+def gen_choose_station(names):
+    """
+    生成按顺序选择第一个空闲保留站的代码，结果存入 rs。
+
+    Input:
+    - names (list): 各保留站的局部名字
+
+    Output:
+    - list: 代码行
+    """
+    lines = []
+    for i, name in enumerate(names):
+        lines.append(f"{'if' if i == 0 else 'elif'} not {name}.busy:")
+        lines.append(f"    rs = {name}")
+    if names:
+        lines.append("else:")
+        lines.append("    rs = None")
+    else:
+        lines.append("rs = None")
+    return lines
+
+
+def gen_fp_issue(names, execution_cycles, quiet):
+    """
+    生成向浮点数执行单元发射指令的代码，对应 FPUnit.issue_instruction 与其后的寄存器写入。
+    先确认有空闲保留站再读取操作数、创建ROB条目；没有空闲保留站时只复现 clear_rob 留下的空槽位。
+
+    Input:
+    - names (list): 该单元各保留站的局部名字
+    - execution_cycles (dict): 不同操作的执行周期
+    - quiet (bool): 是否省略发射失败时的打印
+
+    Output:
+    - list: 代码行
+    """
+    reads = gen_read("ins.src1", "vj", "qj") + gen_read("ins.src2", "vk", "qk")
+    lines = gen_choose_station(names)
+    lines.append("if rs is not None:")
+    lines += indent(reads, 1)
+    lines += indent(gen_rob_issue(), 1)
+    lines += [
+        "    entry.destination = ins.destination",
+        "    rs.busy = True",
+        "    rs.op = op",
+        "    rs.vj = vj",
+        "    rs.vk = vk",
+        "    rs.qj = qj",
+        "    rs.qk = qk",
+        "    rs.dest = ins.destination",
+        "    rs.rob_index = rob_index",
+        f"    rs.remain_time = {latency_expr(execution_cycles)}",
+        "    rs.issue_this_cycle = True",
+        "    queue.popleft()",
+    ]
+    lines += indent(gen_write("ins.destination", "rob_index"), 1)
+    lines.append("else:")
+    if not quiet:
+        lines += indent(reads, 1)
+        lines += [
+            "    print(f\"No available Reservation Station for instruction: {op} {ins.destination}, \"",
+            "          f\"{vj}, {vk}, {qj}, {qk}, {rob.rob_index_counter + 1}\")",
+        ]
+    lines.append("    entries[tail] = None")
+    return lines
+
+
+def gen_load_issue(names, quiet):
+    """
+    生成向 Load Buffer 发射指令的代码，对应 Memory.issue_instruction 与其后的寄存器写入。
+
+    Input:
+    - names (list): 各 Load Buffer 的局部名字
+    - quiet (bool): 是否省略发射失败时的打印
+
+    Output:
+    - list: 代码行
+    """
+    lines = gen_choose_station(names)
+    lines.append("if rs is not None:")
+    lines += indent(gen_read("ins.src2", "vj", "qj"), 1)
+    lines += indent(gen_rob_issue(), 1)
+    lines += [
+        "    entry.destination = ins.destination",
+        "    rs.busy = True",
+        "    rs.rob_index = rob_index",
+        "    rs.op = op",
+        "    rs.dest = ins.destination",
+        "    rs.a = ins.src1",
+        "    rs.vj = vj",
+        "    rs.qj = qj",
+        "    rs.issue_this_cycle = True",
+        "    rs.remain_time = 2",
+        "    queue.popleft()",
+    ]
+    lines += indent(gen_write("ins.destination", "rob_index"), 1)
+    lines.append("else:")
+    if not quiet:
+        lines.append("    print(\"Load Buffer is full.\")")
+    lines.append("    entries[tail] = None")
+    return lines
+
+
+def gen_load_update(name):
+    """
+    生成单个 Load Buffer 的更新代码，对应 Memory.update 的循环体。
+
+    Input:
+    - name (str): Load Buffer 的局部名字
+
+    Output:
+    - list: 代码行
+    """
+    return [
+        f"if {name}.busy:",
+        f"    if {name}.issue_this_cycle:",
+        f"        {name}.issue_this_cycle = False",
+        f"    elif {name}.remain_time == 2:",
+        f"        if {name}.vj:",
+        f"            {name}.a = f\"{{{name}.a}}+Regs[R{{{name}.vj}}]\"",
+        f"            {name}.remain_time = 1",
+        f"            exec_list.append({name}.rob_index)",
+        f"        elif {name}.qj == label:",
+        f"            {name}.vj = f\"#{{label}}\"",
+        f"            {name}.qj = 0",
+        f"    elif {name}.remain_time == 1:",
+        f"        {name}.remain_time = 0",
+        f"        if not bus.new_label:",
+        f"            bus.new_value = f\"Mem[{{{name}.a}}]\"",
+        f"            bus.new_label = {name}.rob_index",
+        f"    else:",
+        f"        {name}.busy = False",
+    ]
+
+
+def gen_fp_update(name):
+    """
+    生成单个浮点保留站的更新代码，对应 FPUnit.update 的循环体。
+
+    Input:
+    - name (str): 保留站的局部名字
+
+    Output:
+    - list: 代码行
+    """
+    return [
+        f"if {name}.busy:",
+        f"    if {name}.qj or {name}.qk:",
+        f"        if data and {name}.qj == label:",
+        f"            {name}.vj = f\"#{{label}}\"",
+        f"            {name}.qj = None",
+        f"        elif data and {name}.qk == label:",
+        f"            {name}.vk = f\"#{{label}}\"",
+        f"            {name}.qk = None",
+        f"    elif {name}.remain_time > 0:",
+        f"        if not {name}.issue_this_cycle:",
+        f"            exec_list.append({name}.rob_index)",
+        f"            {name}.remain_time -= 1",
+        f"            if {name}.remain_time == 0:",
+        f"                vj = {name}.vj",
+        f"                vk = {name}.vk",
+        f"                vj_result = vj if isinstance(vj, str) else f\"Reg[F{{vj}}]\"",
+        f"                vk_result = vk if isinstance(vk, str) else f\"Reg[F{{vk}}]\"",
+        f"                operator = OPERATORS.get({name}.op)",
+        f"                if operator is None:",
+        f"                    raise ValueError(f\"Error operation!\")",
+        f"                if not bus.new_label:",
+        f"                    bus.new_value = f\"{{vj_result}} {{operator}} {{vk_result}}\"",
+        f"                    bus.new_label = {name}.rob_index",
+        f"                else:",
+        f"                    {name}.remain_time += 1",
+        f"    else:",
+        f"        {name}.busy = False",
+        f"    {name}.issue_this_cycle = False",
+    ]
+
+
+def gen_step_source(cpu, quiet=False):
+    """
+    根据CPU的配置生成单周期函数的源代码。
+
+    Input:
+    - cpu (CPU): 已构造的模拟器对象
+    - quiet (bool): 是否省略发射失败时的打印
+
+    Output:
+    - tuple: (源代码字符串, 代码中引用的名字空间)
+    """
+    rob_size = cpu.reorder_buffer.size
+    namespace = {
+        "cpu": cpu,
+        "rob": cpu.reorder_buffer,
+        "entries": cpu.reorder_buffer.entries,
+        "rob_record": cpu.reorder_buffer.rob_record,
+        "commits": cpu.reorder_buffer.commits,
+        "bus": cpu.bus,
+        "rob_bus": cpu.rob_bus,
+        "regs": cpu.register_group.registers,
+        "queue": cpu.instruction_queue,
+        "ReorderBufferEntry": ReorderBufferEntry,
+        "OPERATORS": OPERATORS,
+        # 常用寄存器名预先解析：读取时为 (F寄存器对象或基址寄存器的None, 下标)，写入时为寄存器对象
+        "REGISTERS": {f"{kind}{i}": (register if kind == 'F' else None, i) for kind in "FR"
+                      for i, register in enumerate(cpu.register_group.registers)},
+        "TARGETS": {f"{kind}{i}": register for kind in "FR"
+                    for i, register in enumerate(cpu.register_group.registers)},
+        "UNITS": {"ADDD": UNIT_ADD, "SUBD": UNIT_ADD, "MULTD": UNIT_MULT, "DIVD": UNIT_MULT,
+                  "LD": UNIT_LOAD, "SD": UNIT_SD},
+    }
+    load_names = [f"load{i}" for i in range(len(cpu.memory.load_buffers))]
+    add_names = [f"add{i}" for i in range(len(cpu.fp_add.reservation_stations))]
+    mult_names = [f"mult{i}" for i in range(len(cpu.fp_multd.reservation_stations))]
+    namespace.update(zip(load_names, cpu.memory.load_buffers))
+    namespace.update(zip(add_names, cpu.fp_add.reservation_stations))
+    namespace.update(zip(mult_names, cpu.fp_multd.reservation_stations))
+
+    lines = [
+        "def parse(res):",
+        "    if res[0] in {'F', 'R'} and res[1:].isdigit():",
+        "        register_index = int(res[1:])",
+        "        return (regs[register_index] if res[0] == 'F' else None), register_index",
+        "    raise ValueError(\"Invalid format. The input should be in the format 'F OR R+数字'\")",
+        "",
+        "",
+        "def step():",
+        "    clock = cpu.clock_cycles",
+        "    commits.clear()",
+        "",
+        "    # 阶段 1：发射指令",
+        "    if queue:",
+        "        ins = queue[0]",
+        "        op = ins.opcode",
+        "        tail = rob.tail",
+        f"        next_tail = tail + 1 if tail + 1 < {rob_size} else 0",
+        "        if next_tail == rob.head:",
+        "            pass" if quiet else "            print(clock, \"ROB is full. Unable to issue instruction.\")",
+        "        else:",
+        "            unit = UNITS.get(op)",
+        f"            if unit == {UNIT_ADD}:",
+    ]
+    lines += indent(gen_fp_issue(add_names, cpu.fp_add.execution_cycles, quiet), 4)
+    lines.append(f"            elif unit == {UNIT_MULT}:")
+    lines += indent(gen_fp_issue(mult_names, cpu.fp_multd.execution_cycles, quiet), 4)
+    lines.append(f"            elif unit == {UNIT_LOAD}:")
+    lines += indent(gen_load_issue(load_names, quiet), 4)
+    lines.append(f"            elif unit == {UNIT_SD}:")
+    lines += indent(gen_read("ins.destination", "sd_vj", "sd_qj"), 4)
+    lines += indent(gen_rob_issue(), 4)
+    lines += [
+        "                entry.sd_data[\"vj\"] = sd_vj",
+        "                entry.sd_data[\"qj\"] = sd_qj",
+        "                queue.popleft()",
+        "            else:",
+        "                raise ValueError(f\"Error Instruction!\")",
+        "",
+        "    # 阶段 2：更新各个组件",
+        "    label = bus.label",
+        "    data = bus.value",
+        "    exec_list = bus.exec",
+    ]
+    for name in load_names:
+        lines += indent(gen_load_update(name), 1)
+    for name in add_names + mult_names:
+        lines += indent(gen_fp_update(name), 1)
+    lines += [
+        "",
+        "    # ROB",
+        "    head = rob.head",
+        "    index = head",
+        "    tail = rob.tail",
+        "    while index != tail:",
+        "        entry = entries[index]",
+        "        if entry.instruction.opcode == \"SD\":",
+        "            sd_data = entry.sd_data",
+        "            if sd_data[\"qj\"] and sd_data[\"qj\"] == label:",
+        "                sd_data[\"vj\"] = f\"#{label}\"",
+        "                sd_data[\"qj\"] = None",
+        "            if entry.state == \"Issue\":",
+        "                if entry.issue_this_cycle:",
+        "                    entry.issue_this_cycle = False",
+        "                else:",
+        "                    entry.state = \"Exec\"",
+        "                    entry.destination = f\"Mem[{entry.instruction.src1}+{entry.instruction.src2}]\"",
+        "            elif index == head and entry.state == \"Exec\" and sd_data[\"vj\"]:",
+        "                entry.state = \"Commit\"",
+        "                entry.busy = False",
+        f"                rob.new_head = head + 1 if head + 1 < {rob_size} else 0",
+        "                entry.state_cycle.append(clock - 1)",
+        "                entry.state_cycle.append(clock)",
+        "                rob.committed += 1",
+        "                commits.append(entry)",
+        "                if rob.keep_record:",
+        "                    rob_record.append(entry)",
+        "        else:",
+        "            if entry.state == \"Issue\" and entry.rob_index in exec_list:",
+        "                entry.state = \"Exec\"",
+        "            if index == head and entry.state == \"Write result\":",
+        "                entry.busy = False",
+        "                entry.state = \"Commit\"",
+        f"                rob.new_head = head + 1 if head + 1 < {rob_size} else 0",
+        "                entry.state_cycle.append(clock)",
+        "                rob.committed += 1",
+        "                commits.append(entry)",
+        "                if rob.keep_record:",
+        "                    rob_record.append(entry)",
+        "            if label and entry.rob_index == label:",
+        "                entry.value = data",
+        "                entry.state = \"Write result\"",
+        "                entry.state_cycle.append(clock - 1)",
+        "                entry.state_cycle.append(clock)",
+        "                if not rob_bus.new_label:",
+        "                    rob_bus.new_value = entry.rob_index",
+        "                    rob_bus.new_label = entry.instruction.destination",
+        f"        index = index + 1 if index + 1 < {rob_size} else 0",
+        "    rob.head = rob.new_head",
+        "",
+        "    # 阶段 3：写回（寄存器更新是幂等的，只需执行一次）",
+        "    if rob_bus.value:",
+        "        register = TARGETS.get(rob_bus.label) or regs[parse(rob_bus.label)[1]]",
+        "        register.busy = False",
+        "        register.rob_label = None",
+        "        register.data = rob_bus.value",
+        "    for b in (bus, rob_bus):",
+        "        if b.new_label:",
+        "            b.value = b.new_value",
+        "            b.label = b.new_label",
+        "            b.new_value = \"\"",
+        "            b.new_label = \"\"",
+        "        else:",
+        "            b.value = \"\"",
+        "            b.label = \"\"",
+        "        b.exec = []",
+        "",
+        "    # 是否所有组件都处于空闲状态：指令已全部发射，ROB中head到tail之间恰为未提交的条目",
+        f"    return not queue and rob.head == rob.tail and not ({' or '.join(f'{n}.busy' for n in load_names + add_names + mult_names) or 'False'})",
+        "",
+    ]
+    return "\n".join(lines), namespace
+
+
+def gen_record_source(cpu):
+    """
+    根据CPU的配置生成状态记录函数的源代码，输出与 CPU.record_component_state 完全相同。
+    ROB各行、各保留站行以及寄存器行在相关字段未变化时直接复用上一周期的字符串。
+
+    Input:
+    - cpu (CPU): 已构造的模拟器对象
+
+    Output:
+    - str: 源代码字符串
+    """
+    rob_size = cpu.reorder_buffer.size
+    stations = cpu.all_stations()
+    num_registers = len(cpu.register_group.registers)
+    lines = [
+        f"rob_cache = [None] * {rob_size - 1}",
+        f"station_cache = [[None, None] for _ in range({len(stations)})]",
+        "register_cache = [None, None]",
+        "",
+        "",
+        "def record():",
+        "    tail = rob.tail",
+        f"    new_head = tail + 1 if tail + 1 < {rob_size} else 0",
+        f"    for _ in range({rob_size - 1}):",
+        "        if entries[new_head] is None:",
+        f"            new_head = new_head + 1 if new_head + 1 < {rob_size} else 0",
+        "    parts = []",
+        f"    for i in range({rob_size - 1}):",
+        f"        entry = entries[(new_head + i) % {rob_size}]",
+        "        if entry is None:",
+        "            parts.append(f\"entry{i + 1} :No,,,,;\\n\")",
+        "            continue",
+        "        key = (entry, entry.busy, entry.state, entry.destination, entry.value)",
+        "        cached = rob_cache[i]",
+        "        if cached is None or cached[0] != key:",
+        "            state = \"Yes\" if entry.busy else \"No\"",
+        "            en_state = entry.state if entry.state else \"\"",
+        "            line = (f\"entry{i + 1} : {state}, {trans(entry.instruction)}, {en_state}, \"",
+        "                    f\"{entry.destination}, {entry.value};\\n\")",
+        "            cached = rob_cache[i] = (key, line)",
+        "        parts.append(cached[1])",
+    ]
+    for k, rs in enumerate(stations):
+        name = f"station{k}"
+        lines += [
+            f"    key = ({name}.busy, {name}.op, {name}.vj, {name}.vk, {name}.qj, {name}.qk, {name}.rob_index)",
+            f"    cached = station_cache[{k}]",
+            "    if cached[0] != key:",
+            "        cached[0] = key",
+            f"        cached[1] = rs_state(({name},))",
+            "    parts.append(cached[1])",
+        ]
+    register_key = ", ".join(f"regs[{i}].busy, regs[{i}].rob_label" for i in range(num_registers))
+    lines += [
+        f"    key = ({register_key},)",
+        "    if register_cache[0] != key:",
+        "        reg_reorder = \"Reorder:\"",
+        "        reg_busy = \"Busy:\"",
+        "        for i, reg in enumerate(regs):",
+        "            if reg.busy:",
+        "                reg_reorder += f\"F{i}: {reg.rob_label};\"",
+        "                reg_busy += f\"F{i}:Yes;\"",
+        "            else:",
+        "                reg_reorder += f\"F{i}:;\"",
+        "                reg_busy += f\"F{i}:No;\"",
+        "        register_cache[0] = key",
+        "        register_cache[1] = reg_reorder + \"\\n\" + reg_busy + \"\\n\"",
+        "    parts.append(register_cache[1])",
+        "    parts.append(\"------------------------------------------\\n\")",
+        "    return \"\".join(parts)",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def compile_cycle(cpu, trans, rs_state, quiet=False):
+    """
+    为CPU生成并编译专用的单周期函数与状态记录函数。
+
+    Input:
+    - cpu (CPU): 已构造的模拟器对象，生成后不可再修改其配置
+    - trans (function): 指令转换为输出格式的函数
+    - rs_state (function): 保留站状态格式化函数
+    - quiet (bool): 是否省略发射失败时的打印
+
+    Output:
+    - tuple: (step, record)。step 无参数，返回本周期结束后是否所有组件都已空闲；
+      record 无参数，返回本周期的状态字符串。两者的源代码保存在各自的 source 属性中
+    """
+    source, namespace = gen_step_source(cpu, quiet)
+    record_source = gen_record_source(cpu)
+    stations = cpu.all_stations()
+    namespace.update((f"station{k}", rs) for k, rs in enumerate(stations))
+    namespace["trans"] = trans
+    namespace["rs_state"] = rs_state
+    exec(compile(source, f"<step {id(cpu):x}>", "exec"), namespace)
+    exec(compile(record_source, f"<record {id(cpu):x}>", "exec"), namespace)
+    step = namespace["step"]
+    step.source = source
+    record = namespace["record"]
+    record.source = record_source
+    return step, record
@@ -0,0 +1,197 @@
+# trace_export.py
+"""
+将流水线时间线导出为 Chrome trace-event JSON，可直接在 Perfetto 或 chrome://tracing 中打开。
+
+导出器以观察者的形式挂在 CPU 上，每个周期结束时增量写出事件，
+不在内存中保存完整时间线：
+- 已提交指令：按 ROB 条目分轨道，记录 Issue/Exec/Write result/Commit 各阶段
+- 保留站占用：每个保留站（含 Load Buffer）一条轨道，占用结束时写出一段
+- CDB 广播：总线上每次广播记录为一个时长为1周期的片段
+"""
+import argparse
+import json
+
+from main import CPU, load_instructions
+
+ROB_PID = 1
+RS_PID = 2
+CDB_PID = 3
+
+# 不同指令的阶段名称，与 ReorderBufferEntry.state_cycle 中的时间戳一一对应
+STAGES = ["Issue", "Exec", "Write result", "Commit"]
+SD_STAGES = ["Issue", "Exec", "Commit"]
+
+
+class ChromeTraceExporter:
+    def __init__(self, path):
+        """
+        Chrome trace-event 导出器。
+
+        Args:
+        - path (str): 输出的 JSON 文件路径
+        """
+        self.path = path
+        self.file = open(path, 'w')
+        self.file.write('{"displayTimeUnit":"ns","traceEvents":[\n')
+        self.first_event = True
+        self.rs_open = {}  # 保留站名称 -> (开始周期, rob_index, op)
+        self.rob_lanes = None
+        self.closed = False
+
+    def emit(self, event):
+        """
+        写出一个事件。
+
+        Args:
+        - event (dict): trace-event 格式的事件
+
+        Returns:
+        - None
+        """
+        if not self.first_event:
+            self.file.write(",\n")
+        self.first_event = False
+        self.file.write(json.dumps(event, separators=(",", ":")))
+
+    def emit_metadata(self, cpu):
+        """
+        写出进程与线程名称等元数据事件，第一次观察到CPU时调用。
+
+        Args:
+        - cpu (CPU): 被观察的CPU
+
+        Returns:
+        - None
+        """
+        self.rob_lanes = cpu.reorder_buffer.size - 1
+        for pid, name in ((ROB_PID, "ROB"), (RS_PID, "Reservation Stations"), (CDB_PID, "CDB")):
+            self.emit({"ph": "M", "name": "process_name", "pid": pid, "args": {"name": name}})
+            self.emit({"ph": "M", "name": "process_sort_index", "pid": pid, "args": {"sort_index": pid}})
+        for lane in range(1, self.rob_lanes + 1):
+            self.emit({"ph": "M", "name": "thread_name", "pid": ROB_PID, "tid": lane,
+                       "args": {"name": f"entry{lane}"}})
+        for tid, rs in enumerate(cpu.all_stations(), start=1):
+            self.emit({"ph": "M", "name": "thread_name", "pid": RS_PID, "tid": tid, "args": {"name": rs.name}})
+        self.emit({"ph": "M", "name": "thread_name", "pid": CDB_PID, "tid": 1, "args": {"name": "CDB"}})
+
+    def on_cycle(self, cpu):
+        """
+        周期结束时调用：导出新提交的指令、保留站占用变化以及下一周期的CDB广播。
+
+        Args:
+        - cpu (CPU): 被观察的CPU
+
+        Returns:
+        - None
+        """
+        if self.rob_lanes is None:
+            self.emit_metadata(cpu)
+        cycle = cpu.clock_cycles
+
+        # 新提交的指令
+        for entry in cpu.reorder_buffer.commits:
+            self.emit_instruction(entry)
+
+        # 保留站占用：空闲->占用时记录开始，占用->空闲（或换了指令）时写出一段
+        for tid, rs in enumerate(cpu.all_stations(), start=1):
+            opened = self.rs_open.get(rs.name)
+            if opened and (not rs.busy or opened[1] != rs.rob_index):
+                self.emit_station(tid, rs.name, opened, cycle)
+                opened = None
+                del self.rs_open[rs.name]
+            if rs.busy and not opened:
+                self.rs_open[rs.name] = (cycle, rs.rob_index, rs.op)
+
+        # 总线在周期末更新，更新后的标签在下一周期被各部件读取
+        label, data = cpu.bus.read()
+        if label:
+            self.emit({"ph": "X", "name": f"#{label}", "pid": CDB_PID, "tid": 1, "ts": cycle + 1, "dur": 1,
+                       "args": {"rob": label, "value": data}})
+
+    def on_finish(self, cpu):
+        """
+        模拟结束时调用：补齐未结束的保留站占用并关闭文件。
+
+        Args:
+        - cpu (CPU): 被观察的CPU
+
+        Returns:
+        - None
+        """
+        for tid, rs in enumerate(cpu.all_stations(), start=1):
+            opened = self.rs_open.pop(rs.name, None)
+            if opened:
+                self.emit_station(tid, rs.name, opened, cpu.clock_cycles + 1)
+        self.close()
+
+    def emit_instruction(self, entry):
+        """
+        将一条已提交指令的 state_cycle 转换为嵌套的阶段片段。
+
+        Args:
+        - entry (ReorderBufferEntry): 已提交的ROB条目
+
+        Returns:
+        - None
+        """
+        ins = entry.instruction
+        cycles = entry.state_cycle
+        stages = SD_STAGES if ins.opcode == "SD" else STAGES
+        # 同一时刻在ROB中的指令不超过ROB大小，按序号取模分配轨道不会重叠
+        lane = (entry.rob_index - 1) % self.rob_lanes + 1
+        text = f"{ins.opcode} {ins.destination} {ins.src1} {ins.src2}"
+        self.emit({"ph": "X", "name": text, "cat": ins.opcode, "pid": ROB_PID, "tid": lane,
+                   "ts": cycles[0], "dur": cycles[-1] - cycles[0] + 1,
+                   "args": {"rob": entry.rob_index, "cycles": dict(zip(stages, cycles))}})
+        for i, stage in enumerate(stages):
+            end = cycles[i + 1] if i + 1 < len(cycles) else cycles[i] + 1
+            if end > cycles[i]:
+                self.emit({"ph": "X", "name": stage, "cat": ins.opcode, "pid": ROB_PID, "tid": lane,
+                           "ts": cycles[i], "dur": end - cycles[i]})
+
+    def emit_station(self, tid, name, opened, end_cycle):
+        """
+        写出一段保留站占用。
+
+        Args:
+        - tid (int): 保留站所在轨道
+        - name (str): 保留站名称
+        - opened (tuple): (开始周期, rob_index, op)
+        - end_cycle (int): 释放后的第一个周期
+
+        Returns:
+        - None
+        """
+        start, rob_index, op = opened
+        self.emit({"ph": "X", "name": f"{op} #{rob_index}", "cat": name, "pid": RS_PID, "tid": tid,
+                   "ts": start, "dur": end_cycle - start, "args": {"rob": rob_index}})
+
+    def close(self):
+        """
+        结束 JSON 数组并关闭文件，可重复调用。
+
+        Returns:
+        - None
+        """
+        if not self.closed:
+            self.file.write("\n]}\n")
+            self.file.close()
+            self.closed = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="将模拟时间线导出为 Chrome trace-event JSON")
+    parser.add_argument("input", help="指令文件")
+    parser.add_argument("trace", help="输出的 trace JSON 文件")
+    parser.add_argument("--output", help="周期状态输出文件，默认不输出")
+    parser.add_argument("--rob", type=int, default=6, help="ROB 条目数")
+    parser.add_argument("--load-buffers", type=int, default=2, help="Load Buffer 数量")
+    args = parser.parse_args()
+
+    exporter = ChromeTraceExporter(args.trace)
+    cpu = CPU(num_registers=11, memory_size=1024, num_load_buffers=args.load_buffers, num_rob_entries=args.rob,
+              instruction_queue=load_instructions(args.input, lazy=True), observers=[exporter])
+    try:
+        cpu.run_simulation(args.output)
+    finally:
+        exporter.close()
@@ -0,0 +1,133 @@
+# workload.py
+"""
+可复现的合成指令序列生成器，输出与 input/*.txt 相同的格式。
+
+可控制的参数：
+- 指令类型比例（LD/SD/ADDD/SUBD/MULTD/DIVD）
+- 依赖距离：源操作数引用前面第 d 条指令结果的平均距离
+- 寄存器压力：使用的浮点寄存器数量
+- 长度：逐行生成，不在内存中保存整条序列，可生成 10^7 条以上
+
+生成的序列避开了模拟器无法完成的写法：Load 的基址只使用 R1 以上的基址寄存器，
+SD 不存 F0，浮点指令的两个源操作数不相同。
+"""
+import argparse
+import random
+from collections import deque
+
+DEFAULT_MIX = {"LD": 0.3, "SD": 0.1, "ADDD": 0.25, "SUBD": 0.15, "MULTD": 0.15, "DIVD": 0.05}
+NUM_BASE_REGISTERS = 8
+
+
+def generate_trace(length, seed=0, mix=None, dependency_distance=4.0, dependency_rate=0.6, registers=8,
+                   num_registers=11):
+    """
+    逐行生成合成指令序列。
+
+    Input:
+    - length (int): 指令条数
+    - seed (int): 随机种子，相同参数与种子生成相同序列
+    - mix (dict): 指令类型到相对比例的映射，默认 DEFAULT_MIX
+    - dependency_distance (float): 有依赖时，被依赖指令与当前指令的平均距离（几何分布）
+    - dependency_rate (float): 每个源操作数依赖前面某条指令结果的概率
+    - registers (int): 使用的浮点寄存器数量（F0 起），决定寄存器压力，至少为2，不超过 num_registers
+    - num_registers (int): 运行该序列的模拟器的寄存器数量
+
+    Output:
+    - generator: 每次产生一行指令文本
+    """
+    if registers < 2:
+        raise ValueError("At least two registers are required.")
+    if registers > num_registers:
+        raise ValueError(f"Cannot use {registers} registers on a simulator with {num_registers} registers.")
+    mix = mix if mix else DEFAULT_MIX
+    rng = random.Random(seed)
+    opcodes = list(mix)
+    weights = [mix[op] for op in opcodes]
+    # 最近写过的目的寄存器，用于按依赖距离选择源操作数
+    history = deque(maxlen=max(1, int(dependency_distance * 8)))
+
+    def source(exclude=None, avoid_f0=False):
+        if history and rng.random() < dependency_rate:
+            distance = 1
+            while rng.random() > 1.0 / max(dependency_distance, 1.0) and distance < len(history):
+                distance += 1
+            reg = history[-distance]
+            if reg != exclude and not (avoid_f0 and reg == 0):
+                return reg
+        low = 1 if avoid_f0 else 0
+        reg = rng.randrange(low, registers)
+        while reg == exclude:
+            reg = rng.randrange(low, registers)
+        return reg
+
+    for _ in range(length):
+        opcode = rng.choices(opcodes, weights)[0]
+        base = f"R{rng.randrange(1, NUM_BASE_REGISTERS)}"
+        if opcode == "LD":
+            dest = rng.randrange(registers)
+            line = f"LD F{dest} {rng.randrange(0, 128)}+ {base}"
+        elif opcode == "SD":
+            dest = None
+            line = f"SD F{source(avoid_f0=True)} {rng.randrange(0, 128)} {base}"
+        else:
+            src1 = source()
+            src2 = source(exclude=src1)
+            dest = rng.randrange(registers)
+            line = f"{opcode} F{dest} F{src1} F{src2}"
+        if dest is not None:
+            history.append(dest)
+        yield line
+
+
+def write_trace(path, length, **kwargs):
+    """
+    将合成指令序列写入文件。
+
+    Input:
+    - path (str): 输出文件路径
+    - length (int): 指令条数
+    - kwargs: 传给 generate_trace 的其他参数
+
+    Output:
+    - None
+    """
+    with open(path, 'w') as file:
+        for line in generate_trace(length, **kwargs):
+            file.write(line + "\n")
+
+
+def parse_mix(text):
+    """
+    解析命令行中的指令比例，如 "LD=3,ADDD=2,MULTD=1"。
+
+    Input:
+    - text (str): 比例字符串
+
+    Output:
+    - dict: 指令类型到比例的映射
+    """
+    mix = {}
+    for item in text.split(","):
+        opcode, weight = item.split("=")
+        if opcode not in DEFAULT_MIX:
+            raise ValueError(f"Unsupported instruction: {opcode}")
+        mix[opcode] = float(weight)
+    return mix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成合成指令序列")
+    parser.add_argument("output", help="输出的指令文件")
+    parser.add_argument("--length", type=int, default=1000, help="指令条数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--mix", type=parse_mix, default=None, help="指令比例，如 LD=3,ADDD=2,MULTD=1")
+    parser.add_argument("--distance", type=float, default=4.0, help="平均依赖距离")
+    parser.add_argument("--dependency-rate", type=float, default=0.6, help="源操作数存在依赖的概率")
+    parser.add_argument("--registers", type=int, default=8, help="使用的浮点寄存器数量")
+    parser.add_argument("--num-registers", type=int, default=11, help="模拟器的寄存器数量")
+    args = parser.parse_args()
+    if not 2 <= args.registers <= args.num_registers:
+        parser.error(f"--registers must be between 2 and {args.num_registers}")
+    write_trace(args.output, args.length, seed=args.seed, mix=args.mix, dependency_distance=args.distance,
+                dependency_rate=args.dependency_rate, registers=args.registers, num_registers=args.num_registers)